@@ -0,0 +1,73 @@
+"""
+A small in process cache, used for documents that are read far
+more often than they are written, such as experiment definitions.
+Entries expire so that writes made by other processes are picked
+up after a short while.
+"""
+
+import threading
+import time
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """
+    A thread safe mapping where every entry expires after its time to live.
+    Once maxsize entries are stored, the oldest entry is evicted first.
+
+    Args:
+        maxsize (int): The maximum number of entries to keep
+        ttl (float): The default number of seconds an entry is kept
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 5):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Returns the value for the key, or None if it is missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self.delete(key)
+            return None
+
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value for the key, optionally with its own time to live
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.maxsize:
+                oldest_key = next(iter(self._entries))
+                del self._entries[oldest_key]
+
+            self._entries[key] = (expires_at, value)
+
+    def delete(self, key: Hashable) -> None:
+        """
+        Remove the key from the cache, if it is present
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove every entry from the cache
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
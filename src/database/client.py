@@ -1,3 +1,6 @@
+# pylint: disable=broad-exception-raised
+
+import threading
 from urllib.parse import quote
 
 from pymongo import MongoClient
@@ -10,13 +13,65 @@ DB_NAME_TO_URI = {
     "ab_testing": "mongodb+srv://{db_user}:{db_password}@{deployment_domain}/?retryWrites=true&w=majority"
 }
 
+# Options shared by every client created, the pool is shared across
+# all DbClient instances so it should be sized for the whole process.
+# zlib is used for compression as it needs no extra dependencies, the
+# write concern and retries are left to the connection URI
+CLIENT_OPTIONS = {
+    "uuidRepresentation": "standard",
+    "maxPoolSize": 50,
+    "minPoolSize": 5,
+    "maxIdleTimeMS": 60000,
+    "compressors": "zlib",
+    "retryReads": True,
+}
+
+_clients: dict[tuple[EnvStage, str], MongoClient] = {}
+_clients_lock = threading.Lock()
+# Collections that have had their indexes ensured by this process
+_indexed_collections: set[tuple[int, str]] = set()
+
+
+def _get_or_create_client(env: Env, deployment: str) -> MongoClient:
+    """
+    Returns the MongoClient for the stage and deployment, creating it
+    the first time it is requested. MongoClient is thread safe and
+    is meant to be created once per process, as creating one performs
+    DNS lookups, server discovery, and opens a new connection pool
+    """
+    key = (env.env_stage, deployment)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            return client
+
+        env_db_uri = env["MONGO_DB_URI"]
+        if env_db_uri is not None:
+            db_uri = env_db_uri
+        else:
+            db_uri = DB_NAME_TO_URI[deployment].format(
+                db_user=quote(env["MONGO_USER"]),
+                db_password=quote(env["MONGO_PASSWORD"]),
+                deployment_domain=env["MONGO_DEPLOYMENT_SUBDOMAIN"],
+            )
+
+        client = MongoClient(db_uri, **CLIENT_OPTIONS)
+        _clients[key] = client
+        return client
+
 
 class DbClient:
     """
     A wrapper for the pymongo client and enviromental concerns. There are two ways to
     initialize the client, either by providing the DB URI directly, and including
     the needed credentials, or by providing a valid username and password for a
-    user with access to the database.
+    user with access to the database. The underlying pymongo client is shared
+    between all instances with the same stage and deployment, and is only
+    created the first time it is used.
 
     Args:
         env_stage (EnvStage): The stage of the environment
@@ -27,26 +82,81 @@ class DbClient:
     def __init__(
         self, env_stage: EnvStage = EnvStage.DEV, deployment: str = "ab_testing"
     ):
-        self.env = Env(env_stage)
-        env_db_uri = self.env["MONGO_DB_URI"]
-        if env_db_uri is not None:
-            self.client = MongoClient(env_db_uri, uuidRepresentation="standard")
-            return
+        self.env = Env.for_stage(env_stage)
+        self.deployment = deployment
+        self._collections: dict[tuple[str, str], Collection] = {}
 
-        db_uri = DB_NAME_TO_URI[deployment].format(
-            db_user=quote(self.env["MONGO_USER"]),
-            db_password=quote(self.env["MONGO_PASSWORD"]),
-            deployment_domain=self.env["MONGO_DEPLOYMENT_SUBDOMAIN"],
-        )
-        self.client = MongoClient(db_uri, uuidRepresentation="standard")
+    @property
+    def client(self) -> MongoClient:
+        """
+        The pymongo client, looked up on use so that importing the shared
+        client does not need the database credentials
+        """
+        return _get_or_create_client(self.env, self.deployment)
 
     def get_collection(self, model_instance: BaseCollectionModel) -> Collection:
         """
-        Get a collection from the mongo database
+        Get a collection from the mongo database. Collections are resolved
+        once per database and collection name, and reused afterwards
         """
-        db_name = model_instance.DB_NAME
-        collection_name = model_instance.COLLECTION_NAME
+        collection_key = (model_instance.DB_NAME, model_instance.COLLECTION_NAME)
+        collection = self._collections.get(collection_key)
+        if collection is None:
+            collection = self._resolve_collection(model_instance)
+            self._collections[collection_key] = collection
+
+        return collection
+
+    def _resolve_collection(self, model_instance: BaseCollectionModel) -> Collection:
+        """
+        Look up the collection in the stage specific database,
+        making sure its indexes exist
+        """
+        db_with_env = f"{model_instance.DB_NAME}--{self.env.env_stage.value}"
+        collection = self.client[db_with_env][model_instance.COLLECTION_NAME]
+
+        if (id(self.client), collection.full_name) not in _indexed_collections:
+            self.ensure_indexes(model_instance, collection)
+
+        return collection
+
+    def ensure_indexes(
+        self, model_instance: BaseCollectionModel, collection: Collection
+    ) -> None:
+        """
+        Create the indexes a model relies on, this only needs to happen
+        once per collection, as creating an existing index is a no-op.
+        The UUID field is unique, which lets inserts rely on the index
+        rather than checking for an existing model first. Any other
+        indexes are declared on the model through INDEXES
+        """
+        collection.create_index(model_instance.UUID_FIELD, unique=True)
+        if model_instance.INDEXES:
+            collection.create_indexes(list(model_instance.INDEXES))
+        _indexed_collections.add((id(self.client), collection.full_name))
+
+    def drop_testing_databases(self, db_names: list[str]) -> None:
+        """
+        Drop the testing stage databases with the given names, so tests can
+        start from empty collections. Collections are resolved again on
+        their next use, which creates their indexes again
+        """
+        if self.env.env_stage != EnvStage.TESTING:
+            raise Exception("Only testing databases can be dropped")
+
+        for db_name in db_names:
+            db_with_env = f"{db_name}--{self.env.env_stage.value}"
+            self.client.drop_database(db_with_env)
+
+            for collection_key in list(self._collections):
+                if collection_key[0] == db_name:
+                    del self._collections[collection_key]
 
-        db_with_env = f"{db_name}--{self.env.env_stage.value}"
-        db = self.client[db_with_env]
-        return db[collection_name]
+            _indexed_collections.difference_update(
+                {
+                    indexed
+                    for indexed in _indexed_collections
+                    if indexed[0] == id(self.client)
+                    and indexed[1].startswith(f"{db_with_env}.")
+                }
+            )
@@ -7,10 +7,17 @@ The repository itself will be used to handle
 the application logic of the application, and
 allow for more complex queries
 """
+import copy
+import functools
+import logging
+import threading
 import uuid
-from enum import Enum
-from typing import Optional
+from typing import Any, Optional
 
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from src.database.cache import TTLCache
 from src.database.client import DbClient
 from src.database.models import (
     BaseCollectionModel,
@@ -18,10 +25,36 @@ from src.database.models import (
     ExperimentParticipant,
     ExperimentVariant,
     FunnelEvent,
+    ParticipantAssignment,
     ParticipantToUser,
     User,
 )
 
+DUPLICATE_KEY_ERROR_CODE = 11000
+
+logger = logging.getLogger(__name__)
+
+# Documents fetched per round trip by batch reads, the driver default
+# of 101 would need several getMore calls for larger batches
+READ_BATCH_SIZE = 1000
+
+# Reads of models with a READ_CACHE_TTL, keyed by collection and UUID
+read_cache = TTLCache(maxsize=1024)
+
+
+class _RequestReads(threading.local):
+    """
+    Models read by the current thread while a request scope is active,
+    so a model read several times within a request is only built once
+    """
+
+    def __init__(self):
+        self.active = False
+        self.models: dict[tuple[str, uuid.UUID], BaseCollectionModel] = {}
+
+
+request_reads = _RequestReads()
+
 
 class GenericCrud:
     """
@@ -38,6 +71,7 @@ class GenericCrud:
         """
         Create a new model in the database, if a model with the same UUID does not exist. If
         you provide a UUID, it will be used, otherwise a new UUID will be generated.
+        Existing models are detected by the unique index on the UUID field.
         """
         collection = db.get_collection(cls.model_class())
         model_dict = model_instance.to_dict()
@@ -47,11 +81,11 @@ class GenericCrud:
         else:
             model_uuid = model_instance.uuid
 
-        if cls.read(db, model_uuid) is not None:
-            return None
-
         model_dict[cls.model_class().UUID_FIELD] = model_uuid
-        insert_result = collection.insert_one(model_dict)
+        try:
+            insert_result = collection.insert_one(model_dict)
+        except DuplicateKeyError:
+            return None
 
         if insert_result.acknowledged and insert_result.inserted_id is not None:
             return model_uuid
@@ -59,27 +93,166 @@ class GenericCrud:
         raise Exception("Failed to insert model")
 
     @classmethod
-    def read(cls, db: DbClient, model_uuid: uuid.UUID) -> Optional[BaseCollectionModel]:
+    def create_many(
+        cls, db: DbClient, model_instances: list[BaseCollectionModel]
+    ) -> list[Optional[uuid.UUID]]:
+        """
+        Create many models with a single unordered insert. Returns the UUID of
+        each model in the same order, or None for models whose UUID already
+        exists, which are skipped the same way create skips them
+        """
+        if not model_instances:
+            return []
+
+        model_class = cls.model_class()
+        collection = db.get_collection(model_class)
+        model_uuids = []
+        model_dicts = []
+        for model_instance in model_instances:
+            model_uuid = model_instance.uuid
+            if model_uuid is None:
+                model_uuid = uuid.uuid4()
+
+            model_dict = model_instance.to_dict()
+            model_dict[model_class.UUID_FIELD] = model_uuid
+            model_uuids.append(model_uuid)
+            model_dicts.append(model_dict)
+
+        try:
+            collection.insert_many(model_dicts, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details["writeErrors"]
+            if any(error["code"] != DUPLICATE_KEY_ERROR_CODE for error in write_errors):
+                raise
+
+            for error in write_errors:
+                model_uuids[error["index"]] = None
+
+        return model_uuids
+
+    @classmethod
+    def read(
+        cls,
+        db: DbClient,
+        model_uuid: uuid.UUID,
+        use_cache: bool = True,
+        excluded_fields: tuple[str, ...] = (),
+    ) -> Optional[BaseCollectionModel]:
         """
-        Returns a model from the database, if it exists, given a UUID
+        Returns a model from the database, if it exists, given a UUID. Excluded
+        fields are not fetched. Models with a READ_CACHE_TTL may be served from
+        the read cache, if the read excludes the model's UNCACHED_FIELDS and
+        use_cache is not False, as for a read that a write depends on. Within a
+        request scope the same instance is returned for every cached read
+        of the model, so it should not be modified
         """
         model_class = cls.model_class()  # pylint: disable=invalid-name
         collection = db.get_collection(model_class)
-        result = collection.find_one({model_class.UUID_FIELD: model_uuid})
+        cache_key = (collection.full_name, model_uuid)
+        use_cache = use_cache and cls.cacheable(excluded_fields)
+        use_request_reads = use_cache and request_reads.active
+
+        if use_request_reads:
+            request_model = request_reads.models.get(cache_key)
+            if request_model is not None:
+                return request_model
+
+        if use_cache:
+            cached_result = read_cache.get(cache_key)
+            if cached_result is not None:
+                # Copied so that changes to the model do not leak into the cache
+                model_instance = cls.from_document(copy.deepcopy(cached_result))
+                if use_request_reads:
+                    request_reads.models[cache_key] = model_instance
+                return model_instance
+
+        # A cached document is fetched without only the uncached fields, so
+        # it serves every cacheable read whatever else that read excludes
+        result = collection.find_one(
+            {model_class.UUID_FIELD: model_uuid},
+            projection=cls.projection(
+                model_class.UNCACHED_FIELDS if use_cache else excluded_fields
+            ),
+        )
 
         if result is None:
             return None
 
-        class_fields = model_class.instance_fields()
-        filtered_result = {field: result[field] for field in class_fields}
+        if use_cache:
+            read_cache.set(cache_key, copy.deepcopy(result), model_class.READ_CACHE_TTL)
 
-        return model_class(**filtered_result)
+        model_instance = cls.from_document(result)
+        if use_request_reads:
+            request_reads.models[cache_key] = model_instance
+
+        return model_instance
+
+    @classmethod
+    def read_field(
+        cls, db: DbClient, model_uuid: uuid.UUID, field: str, use_cache: bool = True
+    ) -> Optional[Any]:
+        """
+        Returns the stored value of a single field of a model, or None if the
+        model does not exist. A cached read of the model is used if there is
+        one and it holds the field, otherwise only that field is fetched
+        """
+        model_class = cls.model_class()
+        collection = db.get_collection(model_class)
+
+        if (
+            use_cache
+            and model_class.READ_CACHE_TTL is not None
+            and field not in model_class.UNCACHED_FIELDS
+        ):
+            cached_result = read_cache.get((collection.full_name, model_uuid))
+            if cached_result is not None:
+                return cached_result.get(field)
+
+        result = collection.find_one(
+            {model_class.UUID_FIELD: model_uuid}, projection={field: 1, "_id": 0}
+        )
+
+        if result is None:
+            return None
+
+        return result.get(field)
 
     @classmethod
-    def update(cls, db: DbClient, model_instance: BaseCollectionModel) -> bool:
+    def read_many(
+        cls,
+        db: DbClient,
+        model_uuids: list[uuid.UUID],
+        excluded_fields: tuple[str, ...] = (),
+    ) -> dict[uuid.UUID, BaseCollectionModel]:
         """
-        Update a model in the database, if it exists. Returns
-        whether the model was updated or not.
+        Returns the models that exist out of the given UUIDs, keyed by their
+        UUID, using a single query. Excluded fields are not fetched, and the
+        unique UUID index is hinted so the planner does not consider others
+        """
+        model_class = cls.model_class()
+        collection = db.get_collection(model_class)
+        results = (
+            collection.find(
+                {model_class.UUID_FIELD: {"$in": list(model_uuids)}},
+                projection=cls.projection(excluded_fields),
+            )
+            .hint([(model_class.UUID_FIELD, 1)])
+            .batch_size(READ_BATCH_SIZE)
+        )
+
+        return {
+            result[model_class.UUID_FIELD]: cls.from_document(result)
+            for result in results
+        }
+
+    @classmethod
+    def update(
+        cls, db: DbClient, model_instance: BaseCollectionModel
+    ) -> BaseCollectionModel:
+        """
+        Update a model in the database, if it exists. Returns the
+        model as it was stored by the update, a model whose values
+        are unchanged is still returned.
         """
         model_class = cls.model_class()
         collection = db.get_collection(model_class)
@@ -88,18 +261,18 @@ class GenericCrud:
 
         del model_dict[model_class.UUID_FIELD]
 
-        if cls.read(db, model_uuid) is None:
-            raise Exception("Model does not exist")
-
-        update_result = collection.update_one(
+        updated_document = collection.find_one_and_update(
             {model_class.UUID_FIELD: model_uuid},
             {"$set": model_dict},
+            projection=cls.projection(),
+            return_document=ReturnDocument.AFTER,
         )
+        cls.invalidate(db, model_uuid)
 
-        if update_result.acknowledged and update_result.modified_count == 1:
-            return True
+        if updated_document is None:
+            raise Exception("Model does not exist")
 
-        return False
+        return cls.from_document(updated_document)
 
     @classmethod
     def delete(cls, db: DbClient, model_uuid: uuid.UUID) -> Optional[uuid.UUID]:
@@ -109,20 +282,79 @@ class GenericCrud:
         model_class = cls.model_class()
         collection = db.get_collection(model_class)
         delete_result = collection.delete_many({model_class.UUID_FIELD: model_uuid})
+        cls.invalidate(db, model_uuid)
 
         if delete_result.acknowledged:
             if delete_result.deleted_count == 1:
                 return model_uuid
             elif delete_result.deleted_count > 1:
-                # This should not happen, but we can convert this into a logged
-                # warning, and add a check for this with observability tools
-                print("Deleted more than one model")
+                # This should not happen, the UUID field has a unique index
+                logger.warning(
+                    "Deleted %d %s models with UUID %s",
+                    delete_result.deleted_count,
+                    model_class.COLLECTION_NAME,
+                    model_uuid,
+                )
                 return model_uuid
             else:
                 return None
 
         raise Exception("Failed to delete model")
 
+    @classmethod
+    def cacheable(cls, excluded_fields: tuple[str, ...]) -> bool:
+        """
+        Whether a read that excludes the given fields may use the read cache
+        """
+        model_class = cls.model_class()
+
+        return model_class.READ_CACHE_TTL is not None and set(
+            model_class.UNCACHED_FIELDS
+        ).issubset(excluded_fields)
+
+    @classmethod
+    def invalidate(cls, db: DbClient, model_uuid: uuid.UUID) -> None:
+        """
+        Drop any cached read of the model, needs to be called by
+        anything that writes to the model outside of this class
+        """
+        collection = db.get_collection(cls.model_class())
+        cache_key = (collection.full_name, model_uuid)
+        read_cache.delete(cache_key)
+        request_reads.models.pop(cache_key, None)
+
+    @classmethod
+    def from_document(cls, document: dict) -> BaseCollectionModel:
+        """
+        Builds a model from a document returned by the database,
+        ignoring any fields the model does not store. Fields left out
+        of the document by a projection keep their default values
+        """
+        model_class = cls.model_class()
+        class_fields = model_class.instance_fields()
+        filtered_result = {
+            field: document[field] for field in class_fields if field in document
+        }
+
+        return model_class(**filtered_result)
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def projection(cls, excluded_fields: tuple[str, ...] = ()) -> dict[str, int]:
+        """
+        A projection of the fields the model stores, so the database only
+        returns those. Large fields that are not needed, such as the
+        participants of a variant, can be excluded as well
+        """
+        projection = {
+            field: 1
+            for field in cls.model_class().instance_fields()
+            if field not in excluded_fields
+        }
+        projection["_id"] = 0
+
+        return projection
+
     @classmethod
     def model_class(cls) -> BaseCollectionModel:
         """
@@ -161,6 +393,16 @@ class ExperimentParticipantCrud(GenericCrud):
         return ExperimentParticipant
 
 
+class ParticipantAssignmentCrud(GenericCrud):
+    """
+    CRUD operations for the participant assignment collection
+    """
+
+    @classmethod
+    def model_class(cls) -> BaseCollectionModel:
+        return ParticipantAssignment
+
+
 class UserCrud(GenericCrud):
     """
     CRUD operations for the user collection
@@ -3,20 +3,28 @@ Simple models for AB testing, they represent wrappers for data that will be stor
 and retrieved from the database.
 """
 
+import dataclasses
 import datetime
-import inspect
+import functools
 import uuid
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Optional, Union
+from typing import Any, Callable, ClassVar, Optional, Union, get_args
+
+from pymongo import IndexModel
 
 
 @dataclass
 class BaseCollectionModel:
     """
-    A base collection for all models to inherit from
+    A base collection for all models to inherit from. Models declare their
+    stored fields as annotations, and list them again in __slots__ to keep
+    instances small. Every subclass is made a dataclass of those fields,
+    keeping the constructor the model defines
     """
 
+    __slots__ = ()
+
     @property
     def DB_NAME(self):  # pylint: disable=invalid-name
         """
@@ -40,22 +48,67 @@ class BaseCollectionModel:
         """
         raise NotImplementedError
 
+    # Indexes the collection needs beyond the unique UUID index
+    INDEXES: ClassVar[tuple[IndexModel, ...]] = ()
+    # Seconds a read of the model may be served from the in process cache,
+    # None disables caching for models that change frequently
+    READ_CACHE_TTL: ClassVar[Optional[float]] = None
+    # Fields left out of cached reads, such as lists that grow without
+    # bound. Only reads that exclude them are cached
+    UNCACHED_FIELDS: ClassVar[tuple[str, ...]] = ()
+
     @property
     def uuid(self):
         """
         The UUID of the model
         """
-        return self.__dict__[self.UUID_FIELD]
+        return getattr(self, self.UUID_FIELD)
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def instance_fields(cls) -> tuple[str, ...]:
+        """
+        All the fields that are desired to be stored in the database,
+        computed once per class
+        """
+        return tuple(field.name for field in dataclasses.fields(cls))
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        dataclass(init=False, repr=False)(cls)
+        cls.to_dict = cls._generate_to_dict()
 
     @classmethod
-    def instance_fields(cls):
+    def _generate_to_dict(cls) -> Callable[["BaseCollectionModel"], dict]:
         """
-        All the fields that are desired to be stored in the database
+        Generate a to_dict specialized to the fields of the class, the same
+        way dataclasses generates __init__. Only the fields typed as an enum
+        need to check for an enum value, the rest are copied as is
         """
+        dict_entries = []
+        for field in cls.instance_fields():
+            if not field.isidentifier():
+                raise ValueError(f"Invalid field name: {field}")
+
+            if _is_enum_type(cls.field_types().get(field)):
+                dict_entries.append(
+                    f"{field!r}: self.{field}.value"
+                    f" if isinstance(self.{field}, Enum) else self.{field},"
+                )
+            else:
+                dict_entries.append(f"{field!r}: self.{field},")
+
+        source = "def to_dict(self):\n    return {\n"
+        source += "".join(f"        {entry}\n" for entry in dict_entries)
+        source += "    }\n"
+
+        namespace = {"Enum": Enum}
+        exec(source, namespace)  # pylint: disable=exec-used
+        to_dict = namespace["to_dict"]
+        to_dict.__doc__ = BaseCollectionModel.to_dict.__doc__
+        to_dict.__qualname__ = f"{cls.__qualname__}.to_dict"
 
-        return [
-            field for field in cls().__dict__ if field not in cls().__class__.__dict__
-        ]
+        return to_dict
 
     def to_dict(self):
         """
@@ -64,7 +117,7 @@ class BaseCollectionModel:
         fields_dict = {}
 
         for field in self.instance_fields():
-            value = self.__dict__[field]
+            value = getattr(self, field)
 
             if isinstance(value, Enum):
                 fields_dict[field] = value.value
@@ -74,23 +127,17 @@ class BaseCollectionModel:
         return fields_dict
 
     @classmethod
+    @functools.lru_cache(maxsize=None)
     def field_types(cls) -> dict[str, Any]:
         """
-        Return a dictionary of the field names and their types
+        Return a dictionary of the field names and their types, taken from
+        the annotations of the constructor and computed once per class
         """
-        init_signature = inspect.signature(cls.__init__)
-        parameter_types = {}
-
-        for parameter in init_signature.parameters.values():
-            if parameter.name == "self":
-                continue
-
-            parameter_name = parameter.name
-            parameter_type = parameter.annotation
-
-            parameter_types[parameter_name] = parameter_type
-
-        return parameter_types
+        return {
+            parameter_name: parameter_type
+            for parameter_name, parameter_type in cls.__init__.__annotations__.items()
+            if parameter_name != "return"
+        }
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}({self.to_dict()})"
@@ -99,6 +146,16 @@ class BaseCollectionModel:
         return self.__repr__()
 
 
+def _is_enum_type(field_type: Any) -> bool:
+    """
+    Whether a field type is an enum, or a union containing one
+    """
+    field_types = get_args(field_type) or (field_type,)
+    return any(
+        isinstance(option, type) and issubclass(option, Enum) for option in field_types
+    )
+
+
 class ExperimentStatus(Enum):
     """
     The state the experiment is in. Most states are self-explanatory, but "stopped"
@@ -128,9 +185,30 @@ class Experiment(BaseCollectionModel):
     The root model for AB testing, represents an hypothesis to be tested
     """
 
+    name: Optional[str]
+    description: Optional[str]
+    experiment_uuid: Optional[uuid.UUID]
+    start_date: Optional[datetime.datetime]
+    end_date: Optional[datetime.datetime]
+    experiment_status: ExperimentStatus
+    experiment_variants: list[uuid.UUID]
+
+    __slots__ = (
+        "name",
+        "description",
+        "experiment_uuid",
+        "start_date",
+        "end_date",
+        "experiment_status",
+        "experiment_variants",
+    )
+
     DB_NAME = "ab_testing"
     COLLECTION_NAME = "experiments"
     UUID_FIELD = "experiment_uuid"
+    # Experiments are read by every visitor but only change when an admin
+    # changes them, which invalidates the cache in this process
+    READ_CACHE_TTL = 30
 
     def __init__(
         self,
@@ -158,15 +236,42 @@ class Experiment(BaseCollectionModel):
         else:
             self.experiment_variants = experiment_variants
 
+    def contains_variant(self, variant_uuid: uuid.UUID) -> bool:
+        """
+        Check if the variant is one of the experiment's variants. The list
+        is checked as it is now, as it can be changed after the experiment
+        is built, and experiments only have a handful of variants
+        """
+        return variant_uuid in self.experiment_variants
+
 
 class ExperimentVariant(BaseCollectionModel):
     """
     A variant/grouping for an experiment
     """
 
+    name: Optional[str]
+    description: Optional[str]
+    variant_uuid: Optional[uuid.UUID]
+    allocation: Optional[float]
+    participants: list[uuid.UUID]
+    participant_count: int
+
+    __slots__ = (
+        "name",
+        "description",
+        "variant_uuid",
+        "allocation",
+        "participants",
+        "participant_count",
+    )
+
     DB_NAME = "ab_testing"
     COLLECTION_NAME = "experiment_variants"
     UUID_FIELD = "variant_uuid"
+    INDEXES = (IndexModel("participants"),)
+    READ_CACHE_TTL = 5
+    UNCACHED_FIELDS = ("participants",)
 
     def __init__(
         self,
@@ -175,6 +280,7 @@ class ExperimentVariant(BaseCollectionModel):
         variant_uuid: Optional[uuid.UUID] = None,
         allocation: Optional[float] = 1,
         participants: Optional[list[uuid.UUID]] = None,
+        participant_count: Optional[int] = None,
     ):
         self.name = name
         self.description = description
@@ -186,12 +292,23 @@ class ExperimentVariant(BaseCollectionModel):
         else:
             self.participants = participants
 
+        # Kept alongside the participants by every push, so the number of
+        # participants can be read without transferring the list itself
+        if participant_count is None:
+            self.participant_count = len(self.participants)
+        else:
+            self.participant_count = participant_count
+
 
 class ExperimentParticipant(BaseCollectionModel):
     """
     A participant in an experiment
     """
 
+    participant_uuid: Optional[uuid.UUID]
+
+    __slots__ = ("participant_uuid",)
+
     DB_NAME = "ab_testing"
     COLLECTION_NAME = "experiment_participants"
     UUID_FIELD = "participant_uuid"
@@ -203,25 +320,75 @@ class ExperimentParticipant(BaseCollectionModel):
         self.participant_uuid = participant_uuid
 
 
+class ParticipantAssignment(BaseCollectionModel):
+    """
+    The variant a participant was assigned to in an experiment. This mirrors
+    the participants list of the variant, indexed so that finding the
+    variant of a participant is a single lookup
+    """
+
+    experiment_uuid: Optional[uuid.UUID]
+    participant_uuid: Optional[uuid.UUID]
+    variant_uuid: Optional[uuid.UUID]
+    assignment_uuid: Optional[uuid.UUID]
+
+    __slots__ = (
+        "experiment_uuid",
+        "participant_uuid",
+        "variant_uuid",
+        "assignment_uuid",
+    )
+
+    DB_NAME = "ab_testing"
+    COLLECTION_NAME = "participant_assignments"
+    UUID_FIELD = "assignment_uuid"
+    INDEXES = (
+        IndexModel([("experiment_uuid", 1), ("participant_uuid", 1)], unique=True),
+    )
+
+    def __init__(
+        self,
+        experiment_uuid: Optional[uuid.UUID] = None,
+        participant_uuid: Optional[uuid.UUID] = None,
+        variant_uuid: Optional[uuid.UUID] = None,
+        assignment_uuid: Optional[uuid.UUID] = None,
+    ):
+        self.experiment_uuid = experiment_uuid
+        self.participant_uuid = participant_uuid
+        self.variant_uuid = variant_uuid
+        self.assignment_uuid = assignment_uuid
+
+
 class User(BaseCollectionModel):
     """
-    A user that has an account in the system
+    A user that has an account in the system. The salt of the
+    password is stored as part of the bcrypt hash
     """
 
+    username: Optional[str]
+    hashed_password: Optional[str]
+    user_uuid: Optional[uuid.UUID]
+
+    __slots__ = (
+        "username",
+        "hashed_password",
+        "user_uuid",
+    )
+
     DB_NAME = "application"
     COLLECTION_NAME = "users"
     UUID_FIELD = "user_uuid"
+    USERNAME_INDEX = "username_unique_idx"
+    INDEXES = (IndexModel("username", unique=True, name=USERNAME_INDEX),)
 
     def __init__(
         self,
         username: Optional[str] = None,
         hashed_password: Optional[str] = None,
-        random_salt: Optional[str] = None,
         user_uuid: Optional[uuid.UUID] = None,
     ):
         self.username = username
         self.hashed_password = hashed_password
-        self.random_salt = random_salt
         self.user_uuid = user_uuid
 
 
@@ -230,6 +397,14 @@ class ParticipantToUser(BaseCollectionModel):
     A mapping of a participant to a user
     """
 
+    participant_uuid: Optional[uuid.UUID]
+    user_uuid: Optional[uuid.UUID]
+
+    __slots__ = (
+        "participant_uuid",
+        "user_uuid",
+    )
+
     DB_NAME = "application"
     COLLECTION_NAME = "participants_to_users"
     UUID_FIELD = "participant_uuid"
@@ -248,6 +423,18 @@ class FunnelEvent(BaseCollectionModel):
     A funnel event
     """
 
+    session_uuid: Optional[uuid.UUID]
+    event_time: Optional[datetime.datetime]
+    event_uuid: Optional[uuid.UUID]
+    event_step: FunnelStep
+
+    __slots__ = (
+        "session_uuid",
+        "event_time",
+        "event_uuid",
+        "event_step",
+    )
+
     DB_NAME = "application"
     COLLECTION_NAME = "funnel_events"
     UUID_FIELD = "event_uuid"
@@ -259,7 +446,6 @@ class FunnelEvent(BaseCollectionModel):
         event_time: Optional[datetime.datetime] = None,
         event_uuid: Optional[uuid.UUID] = None,
     ):
-        self.session_uuid = session_uuid
         self.session_uuid = session_uuid
         self.event_time = event_time
         self.event_uuid = event_uuid
@@ -5,40 +5,81 @@ Repository wrapper for crud operations. These can be extended to include
 more complex queries and operations, but for now they are simple wrappers
 as the application does not require it
 """
-import importlib
+import functools
+import threading
 import uuid
 from enum import Enum
-from typing import Optional
-
-from src.database.crud import GenericCrud
+from typing import Any, ClassVar, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from src.database.crud import (
+    DUPLICATE_KEY_ERROR_CODE,
+    READ_BATCH_SIZE,
+    ExperimentCrud,
+    ExperimentParticipantCrud,
+    ExperimentVariantCrud,
+    FunnelEventCrud,
+    GenericCrud,
+    ParticipantAssignmentCrud,
+    ParticipantToUserCrud,
+    UserCrud,
+    request_reads,
+)
 from src.database.models import (
     BaseCollectionModel,
     Experiment,
     ExperimentParticipant,
+    ExperimentStatus,
     ExperimentVariant,
     FunnelEvent,
+    ParticipantAssignment,
     ParticipantToUser,
     User,
 )
 from src.shared import db
 
 
+class _DeferredParticipantPushes(threading.local):
+    """
+    Participant pushes queued by the current thread, while deferral is active
+    """
+
+    def __init__(self):
+        self.active = False
+        self.variant_to_participants: dict[uuid.UUID, list[uuid.UUID]] = {}
+
+
+_deferred_participant_pushes = _DeferredParticipantPushes()
+
+# The participant count of a variant, variants written before the count
+# was kept have their participant lists counted by the database instead
+_PARTICIPANT_COUNT = {
+    "$ifNull": [
+        "$participant_count",
+        {"$size": {"$ifNull": ["$participants", []]}},
+    ]
+}
+
+
 class BaseRepository:
     """
     Generic repository that takes key word arguments and
-    converts them into models
+    converts them into models. Each repository sets the model
+    it works with, and the CRUD class for that model
     """
 
+    MODEL_CLASS: ClassVar[type[BaseCollectionModel]]
+    MODEL_CRUD: ClassVar[type[GenericCrud]]
+
     @classmethod
     def create(cls, **kwargs) -> Optional[BaseCollectionModel]:
         """
         Create a new model in the database
         """
-        model_fields: list[str] = cls.model_class().instance_fields()
         model_class: BaseCollectionModel = cls.model_class()
-        for arg in kwargs:
-            if arg not in model_fields:
-                raise Exception(f"Invalid field: {arg}")
+        cls._check_fields(kwargs, cls._field_set())
 
         model_instance = model_class(**kwargs)
         model_uuid = cls.model_crud().create(db, model_instance)
@@ -46,41 +87,124 @@ class BaseRepository:
         if model_uuid is None:
             return None
 
-        model_instance.__dict__[model_class.UUID_FIELD] = model_uuid
+        setattr(model_instance, model_class.UUID_FIELD, model_uuid)
 
         return model_instance
 
     @classmethod
-    def read(cls, model_uuid: uuid.UUID) -> Optional[BaseCollectionModel]:
+    def create_many(
+        cls, model_instances: list[BaseCollectionModel]
+    ) -> list[BaseCollectionModel]:
         """
-        Returns a model from the database, if it exists, given a UUID
+        Create many models in the database with a single insert. Returns
+        the models that were created, with their UUIDs set
         """
-        return cls.model_crud().read(db, model_uuid)
+        model_uuids = cls.model_crud().create_many(db, model_instances)
+        uuid_field = cls.model_class().UUID_FIELD
+
+        created_instances = []
+        for model_instance, model_uuid in zip(model_instances, model_uuids):
+            if model_uuid is not None:
+                setattr(model_instance, uuid_field, model_uuid)
+                created_instances.append(model_instance)
+
+        return created_instances
+
+    @classmethod
+    def read(
+        cls,
+        model_uuid: uuid.UUID,
+        use_cache: bool = True,
+        excluded_fields: tuple[str, ...] = (),
+    ) -> Optional[BaseCollectionModel]:
+        """
+        Returns a model from the database, if it exists, given a UUID.
+        Excluded fields are not fetched, and are left as their defaults.
+        Set use_cache to False to skip the read cache
+        """
+        return cls.model_crud().read(db, model_uuid, use_cache, excluded_fields)
+
+    @classmethod
+    def read_field(
+        cls, model_uuid: uuid.UUID, field: str, use_cache: bool = True
+    ) -> Optional[Any]:
+        """
+        Returns the stored value of a single field of a model, or None if the
+        model does not exist, without fetching the rest of the model
+        """
+        return cls.model_crud().read_field(db, model_uuid, field, use_cache)
+
+    @classmethod
+    def read_many(
+        cls, model_uuids: list[uuid.UUID], excluded_fields: tuple[str, ...] = ()
+    ) -> list[BaseCollectionModel]:
+        """
+        Returns the models with the given UUIDs using a single query, in the
+        same order as the UUIDs provided. Models that do not exist are skipped.
+        Excluded fields are not fetched, and are left as their defaults
+        """
+        models = cls.model_crud().read_many(db, model_uuids, excluded_fields)
+
+        return [
+            models[model_uuid] for model_uuid in model_uuids if model_uuid in models
+        ]
 
     @classmethod
     def update(cls, model_uuid: uuid.UUID, **kwargs) -> Optional[BaseCollectionModel]:
         """
         Update a model in the database
         """
-        model_fields: list[str] = cls.model_class().instance_fields()
-        current_instance = cls.read(model_uuid)
+        cls._check_fields(kwargs, cls._updatable_field_set())
+        current_instance = cls.read(model_uuid, use_cache=False)
+        if current_instance is None:
+            raise Exception("Model does not exist")
+
+        # Building a new instance lets the model convert any enum values,
+        # so the model does not need to be read again after the update
+        model_fields = current_instance.to_dict()
+        model_fields.update(
+            {
+                arg: arg_value.value if isinstance(arg_value, Enum) else arg_value
+                for arg, arg_value in kwargs.items()
+            }
+        )
+        updated_instance = cls.model_class()(**model_fields)
 
-        for arg, arg_value in kwargs.items():
-            if arg not in model_fields or arg == cls.model_class().UUID_FIELD:
-                raise Exception(f"Invalid field: {arg}")
+        return cls.model_crud().update(db, updated_instance)
 
-            if isinstance(arg_value, Enum) and arg_value is not None:
-                current_instance.__dict__[arg] = arg_value.value
-            else:
-                current_instance.__dict__[arg] = arg_value
+    @classmethod
+    def bulk_update(cls, updates: dict[uuid.UUID, dict]) -> int:
+        """
+        Update many models with a single bulk write, given a mapping of model
+        UUID to the fields to set on it. Every field is checked before anything
+        is written. Returns the number of models that were modified
+        """
+        for fields in updates.values():
+            cls._check_fields(fields, cls._updatable_field_set())
+
+        if not updates:
+            return 0
+
+        uuid_field = cls.model_class().UUID_FIELD
+        bulk_result = db.get_collection(cls.model_class()).bulk_write(
+            [
+                UpdateOne(
+                    {uuid_field: model_uuid},
+                    {
+                        "$set": {
+                            field: value.value if isinstance(value, Enum) else value
+                            for field, value in fields.items()
+                        }
+                    },
+                )
+                for model_uuid, fields in updates.items()
+            ],
+            ordered=False,
+        )
+        for model_uuid in updates:
+            cls.model_crud().invalidate(db, model_uuid)
 
-        update_success = cls.model_crud().update(db, current_instance)
-        if update_success:
-            # Update does not work well with enums, so we need to read the model again
-            # and allow the model to convert the enum to the correct type
-            return cls.read(model_uuid)
-
-        return None
+        return bulk_result.modified_count
 
     @classmethod
     def delete(cls, model_uuid: uuid.UUID) -> bool:
@@ -89,22 +213,62 @@ class BaseRepository:
         """
         return cls.model_crud().delete(db, model_uuid)
 
+    @staticmethod
+    def scope_reads_to_request() -> None:
+        """
+        Share cached reads made by the current thread until end_request_reads
+        is called, so a model read several times while handling a request is
+        only built once. Writes to a model drop it from the scope
+        """
+        request_reads.active = True
+
+    @staticmethod
+    def end_request_reads() -> None:
+        """
+        Stop sharing reads for the current thread, and forget the models read
+        """
+        request_reads.active = False
+        request_reads.models = {}
+
     @classmethod
     def model_class(cls) -> BaseCollectionModel:
         """
         Returns the class of the model
         """
-        raise NotImplementedError
+        return cls.MODEL_CLASS
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _field_set(cls) -> frozenset[str]:
+        """
+        The fields of the model, as a set for quick lookups
+        """
+        return frozenset(cls.model_class().instance_fields())
+
+    @classmethod
+    @functools.lru_cache(maxsize=None)
+    def _updatable_field_set(cls) -> frozenset[str]:
+        """
+        The fields of the model that can be updated, which is every field
+        but the UUID
+        """
+        return cls._field_set() - {cls.model_class().UUID_FIELD}
+
+    @staticmethod
+    def _check_fields(kwargs: dict, allowed_fields: frozenset[str]) -> None:
+        """
+        Raise if any of the keyword arguments is not an allowed field
+        """
+        invalid_fields = kwargs.keys() - allowed_fields
+        if invalid_fields:
+            raise Exception(f"Invalid field: {', '.join(sorted(invalid_fields))}")
 
     @classmethod
     def model_crud(cls) -> GenericCrud:
         """
         Returns the CRUD class of the model
         """
-        module = importlib.import_module("src.database.crud")
-        crud_class_name = f"{cls.model_class().__name__}Crud"
-
-        return getattr(module, crud_class_name)
+        return cls.MODEL_CRUD
 
 
 class ExperimentRepository(BaseRepository):
@@ -112,9 +276,8 @@ class ExperimentRepository(BaseRepository):
     Repository for the experiment collection
     """
 
-    @classmethod
-    def model_class(cls) -> BaseCollectionModel:
-        return Experiment
+    MODEL_CLASS = Experiment
+    MODEL_CRUD = ExperimentCrud
 
     @classmethod
     def push_variant(cls, experiment_uuid: uuid.UUID, variant_uuid: uuid.UUID) -> bool:
@@ -126,6 +289,7 @@ class ExperimentRepository(BaseRepository):
             {cls.model_class().UUID_FIELD: experiment_uuid},
             {"$addToSet": {"experiment_variants": variant_uuid}},
         )
+        cls.model_crud().invalidate(db, experiment_uuid)
 
         if update_result.modified_count == 1:
             return True
@@ -133,16 +297,83 @@ class ExperimentRepository(BaseRepository):
         return False
 
     @classmethod
-    def get_all(cls):
+    def read_with_variants(
+        cls, experiment_uuid: uuid.UUID, excluded_variant_fields: tuple[str, ...] = ()
+    ) -> Optional[tuple[Experiment, list[ExperimentVariant]]]:
         """
-        Return all experiments
+        Returns an experiment and its variants, joined in a single query, or None
+        if the experiment does not exist. The variants are in the same order as
+        the experiment lists them. Excluded variant fields are not fetched
         """
-        all_experiments = db.get_collection(cls.model_class()).find({})
-        return [
-            cls.model_crud().read(db, experiment[cls.model_class().UUID_FIELD])
-            for experiment in all_experiments
+        experiments = db.get_collection(cls.model_class()).aggregate(
+            [
+                {"$match": {cls.model_class().UUID_FIELD: experiment_uuid}},
+                {"$limit": 1},
+                {
+                    "$lookup": {
+                        "from": ExperimentVariant.COLLECTION_NAME,
+                        "localField": "experiment_variants",
+                        "foreignField": ExperimentVariant.UUID_FIELD,
+                        "as": "variant_documents",
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 0,
+                        "variant_documents._id": 0,
+                        **{
+                            f"variant_documents.{field}": 0
+                            for field in excluded_variant_fields
+                        },
+                    }
+                },
+            ]
+        )
+        experiment_document = next(experiments, None)
+
+        if experiment_document is None:
+            return None
+
+        variant_uuid_field = ExperimentVariant.UUID_FIELD
+        variants = {
+            document[variant_uuid_field]: ExperimentVariantCrud.from_document(document)
+            for document in experiment_document["variant_documents"]
+        }
+        experiment: Experiment = cls.model_crud().from_document(experiment_document)
+
+        return experiment, [
+            variants[variant_uuid]
+            for variant_uuid in experiment.experiment_variants
+            if variant_uuid in variants
         ]
 
+    @classmethod
+    def get_status(cls, experiment_uuid: uuid.UUID) -> Optional[ExperimentStatus]:
+        """
+        Returns the status of an experiment, or None if it does not exist,
+        without fetching the rest of the experiment
+        """
+        experiment_status = cls.read_field(experiment_uuid, "experiment_status")
+
+        if experiment_status is None:
+            return None
+
+        return ExperimentStatus(experiment_status)
+
+    @classmethod
+    def get_all(cls):
+        """
+        Return all experiments, built straight from the cursor
+        rather than reading each experiment again
+        """
+        model_crud = cls.model_crud()
+        all_experiments = (
+            db.get_collection(cls.model_class())
+            .find({}, projection=model_crud.projection())
+            .batch_size(READ_BATCH_SIZE)
+        )
+        return [model_crud.from_document(experiment) for experiment in all_experiments]
+
 
 class ExperimentVariantRepository(BaseRepository):
     """
@@ -153,37 +384,468 @@ class ExperimentVariantRepository(BaseRepository):
         or more validation in the code
     """
 
+    MODEL_CLASS = ExperimentVariant
+    MODEL_CRUD = ExperimentVariantCrud
+
     @classmethod
-    def model_class(cls) -> BaseCollectionModel:
-        return ExperimentVariant
+    def update(cls, model_uuid: uuid.UUID, **kwargs) -> Optional[ExperimentVariant]:
+        """
+        Update a variant in the database, replacing the participants
+        list also resets the participant count to match it
+        """
+        if "participants" in kwargs and "participant_count" not in kwargs:
+            kwargs["participant_count"] = len(kwargs["participants"])
+
+        return super().update(model_uuid, **kwargs)
 
     @classmethod
     def push_participant(
         cls, variant_uuid: uuid.UUID, participant_uuid: uuid.UUID
+    ) -> Optional[bool]:
+        """
+        Push a participant to the participants list of an experiment variant,
+        unless they are already in it. Returns whether the participant was added.
+        While pushes are deferred, the participant is only queued and None is
+        returned, the write and any error for a missing variant happen once
+        the pushes are flushed
+        """
+        if _deferred_participant_pushes.active:
+            _deferred_participant_pushes.variant_to_participants.setdefault(
+                variant_uuid, []
+            ).append(participant_uuid)
+            return None
+
+        return cls.push_participant_many(variant_uuid, [participant_uuid])
+
+    @classmethod
+    def push_participant_many(
+        cls, variant_uuid: uuid.UUID, participant_uuids: list[uuid.UUID]
     ) -> bool:
         """
-        Push a participant to the participants list of an experiment variant. It uses
-        the $addToSet operator to ensure that the participant is not added more than once
+        Push many participants to the participants list of an experiment variant
+        with a single bulk write. Returns whether any participant was added
         """
-        update_result = db.get_collection(cls.model_class()).update_one(
-            {cls.model_class().UUID_FIELD: variant_uuid},
-            {"$addToSet": {"participants": participant_uuid}},
+        collection = db.get_collection(cls.model_class())
+        bulk_result = collection.bulk_write(
+            cls._participant_pushes(variant_uuid, participant_uuids), ordered=False
         )
+        cls.model_crud().invalidate(db, variant_uuid)
 
-        if update_result.modified_count == 1:
+        if bulk_result.modified_count > 0:
             return True
 
+        # Nothing is matched both for a missing variant, and for
+        # participants that are all already in the variant
+        variant_count = collection.count_documents(
+            {cls.model_class().UUID_FIELD: variant_uuid}, limit=1
+        )
+        if variant_count == 0:
+            raise Exception("Variant not found")
+
         return False
 
+    @classmethod
+    def push_participants(
+        cls, variant_to_participants: dict[uuid.UUID, list[uuid.UUID]]
+    ) -> int:
+        """
+        Push participants to many experiment variants with a single bulk write,
+        so no participant is added to a variant more than once. Returns the
+        number of participants that were added
+        """
+        bulk_result = db.get_collection(cls.model_class()).bulk_write(
+            [
+                push
+                for variant_uuid, participant_uuids in variant_to_participants.items()
+                for push in cls._participant_pushes(variant_uuid, participant_uuids)
+            ],
+            ordered=False,
+        )
+        for variant_uuid in variant_to_participants:
+            cls.model_crud().invalidate(db, variant_uuid)
+
+        return bulk_result.modified_count
+
+    @classmethod
+    def _participant_pushes(
+        cls, variant_uuid: uuid.UUID, participant_uuids: list[uuid.UUID]
+    ) -> list[UpdateOne]:
+        """
+        An update for each participant, pushing them to the participants list
+        only if they are not in it, so the participant count can be incremented
+        by the same update and is kept exact. The updates are pipelines, so a
+        variant written before the count was kept starts from its list size
+        """
+        uuid_field = cls.model_class().UUID_FIELD
+
+        return [
+            UpdateOne(
+                {uuid_field: variant_uuid, "participants": {"$ne": participant_uuid}},
+                [
+                    {
+                        "$set": {
+                            "participants": {
+                                "$concatArrays": [
+                                    {"$ifNull": ["$participants", []]},
+                                    [participant_uuid],
+                                ]
+                            },
+                            "participant_count": {"$add": [_PARTICIPANT_COUNT, 1]},
+                        }
+                    }
+                ],
+            )
+            for participant_uuid in dict.fromkeys(participant_uuids)
+        ]
+
+    @classmethod
+    def defer_participant_pushes(cls) -> None:
+        """
+        Queue the participant pushes made by the current thread, rather than
+        writing each one, until flush_participant_pushes is called. This is
+        meant to be scoped to a single request
+        """
+        _deferred_participant_pushes.active = True
+
+    @classmethod
+    def flush_participant_pushes(cls) -> int:
+        """
+        Write the participant pushes queued by the current thread with a
+        single bulk write, and stop deferring them. Returns the number
+        of participants that were added
+        """
+        variant_to_participants = _deferred_participant_pushes.variant_to_participants
+        _deferred_participant_pushes.active = False
+        _deferred_participant_pushes.variant_to_participants = {}
+
+        if not variant_to_participants:
+            return 0
+
+        return cls.push_participants(variant_to_participants)
+
+    @classmethod
+    def deferred_participants(cls, variant_uuids: list[uuid.UUID]) -> set[uuid.UUID]:
+        """
+        Returns the participants queued by the current thread for any of the
+        given variants, which are not in the participants lists until the
+        pushes are flushed
+        """
+        variant_to_participants = _deferred_participant_pushes.variant_to_participants
+
+        return {
+            participant_uuid
+            for variant_uuid in variant_uuids
+            for participant_uuid in variant_to_participants.get(variant_uuid, ())
+        }
+
+    @classmethod
+    def find_participants_in_variants(
+        cls, variant_uuids: list[uuid.UUID], participant_uuids: list[uuid.UUID]
+    ) -> set[uuid.UUID]:
+        """
+        Returns which of the participants are in any of the given variants.
+        The participant lists are filtered by the database, so only the
+        matching participants are returned
+        """
+        return set(
+            cls.find_variants_with_participants(variant_uuids, participant_uuids)
+        )
+
+    @classmethod
+    def find_variants_with_participants(
+        cls, variant_uuids: list[uuid.UUID], participant_uuids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, uuid.UUID]:
+        """
+        Returns the UUID of the variant, out of the given variants, that each
+        participant is in, keyed by participant UUID. The participant lists
+        are filtered by the database, and participants in none are left out
+        """
+        uuid_field = cls.model_class().UUID_FIELD
+        participant_uuids = list(participant_uuids)
+        matches = db.get_collection(cls.model_class()).aggregate(
+            [
+                {
+                    "$match": {
+                        uuid_field: {"$in": list(variant_uuids)},
+                        "participants": {"$in": participant_uuids},
+                    }
+                },
+                {
+                    "$project": {
+                        "_id": 0,
+                        uuid_field: 1,
+                        "participants": {
+                            "$filter": {
+                                "input": "$participants",
+                                "cond": {"$in": ["$$this", participant_uuids]},
+                            }
+                        },
+                    }
+                },
+            ]
+        )
+
+        return {
+            participant_uuid: match[uuid_field]
+            for match in matches
+            for participant_uuid in match["participants"]
+        }
+
+    @classmethod
+    def has_participant(
+        cls, variant_uuid: uuid.UUID, participant_uuid: uuid.UUID
+    ) -> bool:
+        """
+        Check if a participant is in the participants list of an experiment
+        variant, without loading the list itself
+        """
+        participant_count = db.get_collection(cls.model_class()).count_documents(
+            {
+                cls.model_class().UUID_FIELD: variant_uuid,
+                "participants": participant_uuid,
+            },
+            limit=1,
+        )
+
+        return participant_count > 0
+
+    @classmethod
+    def participant_counts(cls, variant_uuids: list[uuid.UUID]) -> dict[uuid.UUID, int]:
+        """
+        Returns the number of participants in each of the given variants, from
+        the count kept by every push. Variants written before the count was
+        kept have their participant lists counted by the database instead
+        """
+        uuid_field = cls.model_class().UUID_FIELD
+        counts = db.get_collection(cls.model_class()).aggregate(
+            [
+                {"$match": {uuid_field: {"$in": list(variant_uuids)}}},
+                {
+                    "$project": {
+                        uuid_field: 1,
+                        "participant_count": _PARTICIPANT_COUNT,
+                    }
+                },
+            ]
+        )
+
+        return {count[uuid_field]: count["participant_count"] for count in counts}
+
+    @classmethod
+    def read_many_with_participant_counts(
+        cls, variant_uuids: list[uuid.UUID]
+    ) -> list[ExperimentVariant]:
+        """
+        Returns the variants with the given UUIDs in the same order, with their
+        participant counts but not their participant lists, using a single
+        query. As for participant_counts, variants written before the count
+        was kept have their participant lists counted by the database
+        """
+        model_crud = cls.model_crud()
+        uuid_field = cls.model_class().UUID_FIELD
+        projection = model_crud.projection(("participants",))
+        results = db.get_collection(cls.model_class()).aggregate(
+            [
+                {"$match": {uuid_field: {"$in": list(variant_uuids)}}},
+                {
+                    "$project": {
+                        **projection,
+                        "participant_count": _PARTICIPANT_COUNT,
+                    }
+                },
+            ],
+            batchSize=READ_BATCH_SIZE,
+        )
+        variants = {
+            result[uuid_field]: model_crud.from_document(result) for result in results
+        }
+
+        return [
+            variants[variant_uuid]
+            for variant_uuid in variant_uuids
+            if variant_uuid in variants
+        ]
+
+    @classmethod
+    def find_variant_with_participant(
+        cls, variant_uuids: list[uuid.UUID], participant_uuid: uuid.UUID
+    ) -> Optional[uuid.UUID]:
+        """
+        Returns the UUID of the variant, out of the given variants, that
+        the participant is in. Returns None if they are in none of them
+        """
+        uuid_field = cls.model_class().UUID_FIELD
+        variant = db.get_collection(cls.model_class()).find_one(
+            {
+                uuid_field: {"$in": list(variant_uuids)},
+                "participants": participant_uuid,
+            },
+            projection={uuid_field: 1},
+        )
+
+        if variant is None:
+            return None
+
+        return variant[uuid_field]
+
 
 class ExperimentParticipantRepository(BaseRepository):
     """
     Repository for the experiment participant collection
     """
 
+    MODEL_CLASS = ExperimentParticipant
+    MODEL_CRUD = ExperimentParticipantCrud
+
+
+class ParticipantAssignmentRepository(BaseRepository):
+    """
+    Repository for the participant assignment collection
+    """
+
+    MODEL_CLASS = ParticipantAssignment
+    MODEL_CRUD = ParticipantAssignmentCrud
+
     @classmethod
-    def model_class(cls) -> BaseCollectionModel:
-        return ExperimentParticipant
+    def get_variant_uuid(
+        cls, experiment_uuid: uuid.UUID, participant_uuid: uuid.UUID
+    ) -> Optional[uuid.UUID]:
+        """
+        Get the UUID of the variant the participant was assigned to
+        in the experiment, using the experiment and participant index
+        """
+        assignment = db.get_collection(cls.model_class()).find_one(
+            {"experiment_uuid": experiment_uuid, "participant_uuid": participant_uuid},
+            projection={"_id": 0, "variant_uuid": 1},
+        )
+
+        if assignment is None:
+            return None
+
+        return assignment["variant_uuid"]
+
+    @classmethod
+    def get_variant_uuids(
+        cls, experiment_uuid: uuid.UUID, participant_uuids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, uuid.UUID]:
+        """
+        Get the UUIDs of the variants many participants were assigned to in
+        the experiment with a single query, keyed by participant UUID.
+        Participants without an assignment are left out
+        """
+        assignments = (
+            db.get_collection(cls.model_class())
+            .find(
+                {
+                    "experiment_uuid": experiment_uuid,
+                    "participant_uuid": {"$in": list(participant_uuids)},
+                },
+                projection={"_id": 0, "participant_uuid": 1, "variant_uuid": 1},
+            )
+            .batch_size(READ_BATCH_SIZE)
+        )
+
+        return {
+            assignment["participant_uuid"]: assignment["variant_uuid"]
+            for assignment in assignments
+        }
+
+    @classmethod
+    def has_assignment(
+        cls, experiment_uuid: uuid.UUID, participant_uuid: uuid.UUID
+    ) -> bool:
+        """
+        Check if the participant has an assignment in the experiment. Only
+        indexed fields are projected, so the index alone answers the query
+        """
+        assignment = db.get_collection(cls.model_class()).find_one(
+            {"experiment_uuid": experiment_uuid, "participant_uuid": participant_uuid},
+            projection={"_id": 0, "experiment_uuid": 1},
+        )
+
+        return assignment is not None
+
+    @classmethod
+    def get_variant_name(
+        cls, experiment_uuid: uuid.UUID, participant_uuid: uuid.UUID
+    ) -> Optional[str]:
+        """
+        Get the name of the variant the participant was assigned to in the
+        experiment, joining the assignment to its variant in a single query
+        """
+        assignments = db.get_collection(cls.model_class()).aggregate(
+            [
+                {
+                    "$match": {
+                        "experiment_uuid": experiment_uuid,
+                        "participant_uuid": participant_uuid,
+                    }
+                },
+                {"$limit": 1},
+                {
+                    "$lookup": {
+                        "from": ExperimentVariant.COLLECTION_NAME,
+                        "localField": "variant_uuid",
+                        "foreignField": ExperimentVariant.UUID_FIELD,
+                        "as": "variant",
+                    }
+                },
+                {"$unwind": "$variant"},
+                {"$project": {"_id": 0, "name": "$variant.name"}},
+            ]
+        )
+        assignment = next(assignments, None)
+
+        if assignment is None:
+            return None
+
+        return assignment["name"]
+
+    @classmethod
+    def assign(
+        cls,
+        experiment_uuid: uuid.UUID,
+        participant_uuid: uuid.UUID,
+        variant_uuid: uuid.UUID,
+    ) -> Optional[ParticipantAssignment]:
+        """
+        Record the variant a participant was assigned to. Returns None
+        if the participant already has an assignment in the experiment
+        """
+        return cls.create(
+            experiment_uuid=experiment_uuid,
+            participant_uuid=participant_uuid,
+            variant_uuid=variant_uuid,
+        )
+
+    @classmethod
+    def assign_many(
+        cls, experiment_uuid: uuid.UUID, assignments: dict[uuid.UUID, uuid.UUID]
+    ) -> None:
+        """
+        Record the variants many participants were assigned to with a single
+        insert, given a mapping of participant UUID to variant UUID.
+        Participants that already have an assignment are left as they are
+        """
+        try:
+            db.get_collection(cls.model_class()).insert_many(
+                [
+                    {
+                        "experiment_uuid": experiment_uuid,
+                        "participant_uuid": participant_uuid,
+                        "variant_uuid": variant_uuid,
+                        cls.model_class().UUID_FIELD: uuid.uuid4(),
+                    }
+                    for participant_uuid, variant_uuid in assignments.items()
+                ],
+                ordered=False,
+            )
+        except BulkWriteError as e:
+            if any(
+                error["code"] != DUPLICATE_KEY_ERROR_CODE
+                for error in e.details["writeErrors"]
+            ):
+                raise
 
 
 class UserRepository(BaseRepository):
@@ -191,30 +853,37 @@ class UserRepository(BaseRepository):
     Repository for the user collection
     """
 
+    MODEL_CLASS = User
+    MODEL_CRUD = UserCrud
+
     @classmethod
     def get_user_by_username(cls, username: str) -> Optional[User]:
         """
-        Get a user by their username
+        Get a user by their username, looked up through the unique username
+        index. The user is built from the lookup itself, in a single query
         """
-        user = db.get_collection(cls.model_class()).find_one({"username": username})
+        user_class = cls.model_class()
+        model_crud = cls.model_crud()
+        users = (
+            db.get_collection(user_class)
+            .find({"username": username}, projection=model_crud.projection())
+            .hint(user_class.USERNAME_INDEX)
+            .limit(1)
+        )
+        user = next(users, None)
         if user is not None:
-            return cls.model_crud().read(db, user["user_uuid"])
+            return model_crud.from_document(user)
 
         return None
 
-    @classmethod
-    def model_class(cls) -> BaseCollectionModel:
-        return User
-
 
 class ParticipantToUserRepository(BaseRepository):
     """
     Repository for the participant to user collection
     """
 
-    @classmethod
-    def model_class(cls) -> BaseCollectionModel:
-        return ParticipantToUser
+    MODEL_CLASS = ParticipantToUser
+    MODEL_CRUD = ParticipantToUserCrud
 
 
 class FunnelEventRepository(BaseRepository):
@@ -222,9 +891,8 @@ class FunnelEventRepository(BaseRepository):
     Repository for the funnel event collection
     """
 
-    @classmethod
-    def model_class(cls) -> BaseCollectionModel:
-        return FunnelEvent
+    MODEL_CLASS = FunnelEvent
+    MODEL_CRUD = FunnelEventCrud
 
 
 if __name__ == "__main__":
@@ -2,9 +2,11 @@
 Used for working with environment variables
 """
 
+import functools
 import os
 from enum import Enum
 from pathlib import Path
+from typing import ClassVar
 
 from dotenv import load_dotenv
 
@@ -21,21 +23,31 @@ class EnvStage(Enum):
 
 class Env:
     """
-    Used for working with environment variables
+    Used for working with environment variables. The variables are
+    read once, after the .env files are loaded, so later lookups
+    do not go through os.environ. The .env files of a stage are
+    only loaded the first time the stage is used in the process
     """
 
+    _LOADED_STAGES: ClassVar[set[EnvStage]] = set()
+
     def __init__(self, env_stage: EnvStage):
         self.env_stage = env_stage
-        root_path = Path(__file__).parent.parent
-        base_env_path = root_path / ".env"
 
-        if env_stage != EnvStage.PROD:
-            env_specific = root_path / f".env.{env_stage.value}"
-            load_dotenv(env_specific, override=True, verbose=True)
-        load_dotenv(base_env_path)
+        if env_stage not in Env._LOADED_STAGES:
+            root_path = Path(__file__).parent.parent
+            base_env_path = root_path / ".env"
+
+            if env_stage != EnvStage.PROD:
+                env_specific = root_path / f".env.{env_stage.value}"
+                load_dotenv(env_specific, override=True, verbose=True)
+            load_dotenv(base_env_path)
+            Env._LOADED_STAGES.add(env_stage)
+
+        self._values = dict(os.environ)
 
     def __getitem__(self, key: str) -> str:
-        return os.environ.get(key)
+        return self._values.get(key)
 
     @staticmethod
     def load_current_env() -> "Env":
@@ -43,4 +55,12 @@ class Env:
         Load the current environment, given the ENV_STAGE environment variable
         """
         stage = os.environ.get("ENV_STAGE", EnvStage.DEV.value)
-        return Env(EnvStage(stage))
+        return Env.for_stage(EnvStage(stage))
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def for_stage(env_stage: EnvStage) -> "Env":
+        """
+        The shared environment of a stage, created once per process
+        """
+        return Env(env_stage)
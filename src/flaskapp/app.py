@@ -7,9 +7,19 @@ import uuid
 from datetime import datetime
 from enum import Enum
 
-from flask import Flask, jsonify, redirect, render_template, request, session, url_for
-
-from src.database.models import Experiment, FunnelStep, User
+from flask import (
+    Flask,
+    g,
+    jsonify,
+    redirect,
+    render_template,
+    request,
+    session,
+    url_for,
+)
+
+from src.database.models import Experiment, FunnelEvent, FunnelStep, User
+from src.database.repository import BaseRepository, ExperimentVariantRepository
 from src.interface import ExperimentInterface
 from src.services import AuthService, ExperimentService, FunnelEventService
 from src.shared import db
@@ -17,6 +27,51 @@ from src.shared import db
 app = Flask(__name__)
 app.secret_key = db.env["FLASK_SECRET_KEY"]
 
+# Parsed once, as it is needed on every visit to the index
+BUTTON_EXPERIMENT_UUID = (
+    uuid.UUID(db.env["BUTTON_EXPERIMENT_UUID"])
+    if db.env["BUTTON_EXPERIMENT_UUID"] is not None
+    else None
+)
+
+
+@app.before_request
+def defer_writes():
+    """
+    Queue the participant pushes made while handling the request,
+    so they are written together once it is done, and share the
+    models read while handling it
+    """
+    BaseRepository.scope_reads_to_request()
+    ExperimentVariantRepository.defer_participant_pushes()
+
+
+@app.teardown_request
+def flush_writes(_exception=None):
+    """
+    Write the participant pushes and funnel events queued while
+    handling the request. Each batch is written even if the other fails
+    """
+    BaseRepository.end_request_reads()
+    funnel_events = g.pop("funnel_events", [])
+
+    try:
+        ExperimentService.flush_participant_pushes()
+    finally:
+        if funnel_events:
+            FunnelEventService.create_funnel_events(funnel_events)
+
+
+def record_funnel_event(session_uuid: uuid.UUID, event_step: FunnelStep):
+    """
+    Queue a funnel event, they are written together once the request is done
+    """
+    g.setdefault("funnel_events", []).append(
+        FunnelEvent(
+            session_uuid=session_uuid, event_step=event_step, event_time=datetime.now()
+        )
+    )
+
 
 class RvBVariant:
     """
@@ -26,25 +81,30 @@ class RvBVariant:
     def __init__(self, variant_name: str = "default"):
         self.variant_name = variant_name
 
+        # Worked out once, as the template may ask for them more than once
+        if "red" in variant_name:
+            self._color = "red"
+        elif "blue" in variant_name:
+            self._color = "blue"
+        else:
+            self._color = "default"
+
+        if "with_text" in variant_name:
+            self._text = "Start your journey!"
+        else:
+            self._text = "Register"
+
     def get_color(self) -> str:
         """
         Get the color of the button
         """
-        if "red" in self.variant_name:
-            return "red"
-        if "blue" in self.variant_name:
-            return "blue"
-
-        return "default"
+        return self._color
 
     def get_text(self) -> str:
         """
         Get the text of the button
         """
-        if "with_text" in self.variant_name:
-            return "Start your journey!"
-
-        return "Register"
+        return self._text
 
 
 @app.route("/", methods=["GET", "POST"])
@@ -63,7 +123,7 @@ def index():
         print(f"Variant funnel advanced: {button_value}")
         return redirect(url_for("register"))
 
-    if is_logged_in() or db.env["BUTTON_EXPERIMENT_UUID"] is None:
+    if is_logged_in() or BUTTON_EXPERIMENT_UUID is None:
         return render_template(
             "index.html", logged_in=is_logged_in(), variant=RvBVariant()
         )
@@ -75,7 +135,7 @@ def index():
             "index.html", logged_in=is_logged_in(), variant=RvBVariant(override)
         )
 
-    rb_experiment_uuid = uuid.UUID(db.env["BUTTON_EXPERIMENT_UUID"])
+    rb_experiment_uuid = BUTTON_EXPERIMENT_UUID
     rb_experiment: Experiment = ExperimentInterface.get_experiment(rb_experiment_uuid)
 
     if not rb_experiment:
@@ -115,7 +175,7 @@ def login():
                 "login.html", error_message="Invalid credentials", logged_in=False
             )
 
-        if not AuthService.validate_auth(current_user.user_uuid, username, password):
+        if not AuthService.check_user_password(current_user, password):
             return render_template(
                 "login.html", error_message="Invalid credentials", logged_in=False
             )
@@ -123,9 +183,7 @@ def login():
         session["user_uuid"] = current_user.user_uuid
         session["session_step"] = FunnelStep.SIGNED_UP.value
 
-        FunnelEventService.create_funnel_event(
-            session["session_uuid"], FunnelStep.SIGNED_UP.value, datetime.now()
-        )
+        record_funnel_event(session["session_uuid"], FunnelStep.SIGNED_UP)
         FunnelEventService.attempt_to_link_participant(
             session["session_uuid"], current_user.user_uuid
         )
@@ -184,18 +242,14 @@ def register():
 
         session["user_uuid"] = user.user_uuid
         session["session_step"] = FunnelStep.SIGNED_UP.value
-        FunnelEventService.create_funnel_event(
-            session["session_uuid"], FunnelStep.SIGNED_UP.value, datetime.now()
-        )
+        record_funnel_event(session["session_uuid"], FunnelStep.SIGNED_UP)
         return redirect(url_for("personal_page"))
 
     if not session_variables_set():
         create_session()
 
     session["session_step"] = FunnelStep.SIGNING_UP.value
-    FunnelEventService.create_funnel_event(
-        session["session_uuid"], FunnelStep.SIGNING_UP.value, datetime.now()
-    )
+    record_funnel_event(session["session_uuid"], FunnelStep.SIGNING_UP)
     return render_template("register.html")
 
 
@@ -216,9 +270,7 @@ def create_session():
         session["session_uuid"] = uuid.uuid4()
     session["session_step"] = FunnelStep.LANDED.value
 
-    FunnelEventService.create_funnel_event(
-        session["session_uuid"], FunnelStep.LANDED.value, datetime.now()
-    )
+    record_funnel_event(session["session_uuid"], FunnelStep.LANDED)
 
 
 def session_variables_set() -> bool:
@@ -253,9 +305,7 @@ def experiment_route(experiment_uuid):
         experiment_button = request.form.get("status-adv", "")
         update_allocations = request.form.getlist("allocation-value")
         update_descriptions = request.form.getlist("variant-description")
-        previous_status = ExperimentService.get_experiment(
-            actual_uuid
-        ).experiment_status
+        previous_status = ExperimentService.get_status(actual_uuid)
 
         if experiment_button == "Play":
             new_status = ExperimentService.start_experiment(actual_uuid)
@@ -7,10 +7,14 @@ to interact with the framework
 import uuid
 from typing import Optional
 
-from src.database.models import Experiment, ExperimentStatus, ExperimentVariant
+from src.database.cache import TTLCache
+from src.database.models import Experiment, ExperimentVariant
 from src.database.repository import ExperimentRepository, ExperimentVariantRepository
 from src.services import ExperimentService, ExperimentVariantService
 
+# Summaries for the admin pages, keyed by the experiment and its generation
+summary_cache = TTLCache(maxsize=256, ttl=60)
+
 
 class ExperimentInterface:
     """
@@ -35,54 +39,109 @@ class ExperimentInterface:
         if experiment is None:
             raise Exception("Experiment not found")
 
-        if not ExperimentInterface.experiment_in_progress(experiment_uuid):
+        if not ExperimentService.status_in_progress(experiment.experiment_status):
             return "default"
 
-        if ExperimentService.participant_in_experiment(
-            experiment_uuid, participant_uuid
-        ):
-
-            variant_uuid = ExperimentService.get_variant_uuid_for_participant(
-                experiment_uuid, participant_uuid
-            )
-            return ExperimentVariantService.get_variant(variant_uuid).name
-
-        if experiment.experiment_status in [
-            ExperimentStatus.COMPLETED,
-            ExperimentStatus.PAUSED,
-        ]:
-            return "default"
+        variant_name = ExperimentService.get_variant_name_for_participant(
+            experiment, participant_uuid
+        )
+        if variant_name is not None:
+            return variant_name
 
+        # Whether new participants are taken is decided by a fresh read, as
+        # the cached experiment may lag a status change made by another process
         new_variant_uuid = ExperimentService.add_participant_to_experiment(
             experiment_uuid, participant_uuid
         )
-        return ExperimentVariantService.get_variant(new_variant_uuid).name
+        if new_variant_uuid is None:
+            return "default"
+
+        return ExperimentVariantRepository.read_field(new_variant_uuid, "name")
 
     @staticmethod
-    def get_experiment_summary(experiment_uuid: uuid.UUID) -> dict:
+    def get_variant_names(
+        experiment_uuid: uuid.UUID, participant_uuids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, str]:
         """
-        Get the summary of the experiment
+        Get the variant names for many participants, keyed by participant.
+        Works the same as get_variant_name, but looks up and adds all the
+        participants together, rather than one at a time
         """
         experiment: Experiment = ExperimentRepository.read(experiment_uuid)
+        if experiment is None:
+            raise Exception("Experiment not found")
 
-        if not experiment:
-            return {}
+        participant_uuids = list(dict.fromkeys(participant_uuids))
+        if not ExperimentService.status_in_progress(experiment.experiment_status):
+            return dict.fromkeys(participant_uuids, "default")
 
-        variants: list[ExperimentVariant] = [
-            ExperimentVariantService.get_variant(variant_uuid)
-            for variant_uuid in experiment.experiment_variants
+        variant_uuids = ExperimentService.get_variant_uuids_for_participants(
+            experiment, participant_uuids
+        )
+        new_participant_uuids = [
+            participant_uuid
+            for participant_uuid in participant_uuids
+            if participant_uuid not in variant_uuids
         ]
-        variant_to_participants = {
-            variant.variant_uuid: len(variant.participants) for variant in variants
+        if new_participant_uuids:
+            variant_uuids.update(
+                ExperimentService.add_participants_to_experiment(
+                    experiment_uuid, new_participant_uuids
+                )
+            )
+
+        variant_names = {
+            variant.variant_uuid: variant.name
+            for variant in ExperimentVariantRepository.read_many(
+                experiment.experiment_variants, excluded_fields=("participants",)
+            )
         }
-        total_allocation = sum(variant.allocation for variant in variants)
 
         return {
-            "experiment": ExperimentRepository.read(experiment_uuid),
+            participant_uuid: variant_names.get(
+                variant_uuids.get(participant_uuid), "default"
+            )
+            for participant_uuid in participant_uuids
+        }
+
+    @staticmethod
+    def get_experiment_summary(experiment_uuid: uuid.UUID) -> dict:
+        """
+        Get the summary of the experiment. Summaries are cached until the
+        experiment or its participants are changed by this process, or for a
+        minute, so changes made by other processes may lag
+        """
+        cache_key = (experiment_uuid, ExperimentService.generation(experiment_uuid))
+        summary = summary_cache.get(cache_key)
+        if summary is not None:
+            return summary
+
+        experiment: Experiment = ExperimentRepository.read(experiment_uuid)
+
+        if not experiment:
+            return {}
+
+        # The counts come with the variants, so no participant lists are fetched
+        variants: list[ExperimentVariant] = (
+            ExperimentVariantRepository.read_many_with_participant_counts(
+                experiment.experiment_variants
+            )
+        )
+        variant_to_participants = {}
+        total_allocation = 0
+        for variant in variants:
+            variant_to_participants[variant.variant_uuid] = variant.participant_count
+            total_allocation += variant.allocation
+
+        summary = {
+            "experiment": experiment,
             "variants": variants,
             "variant_to_participants": variant_to_participants,
             "total_allocation": total_allocation,
         }
+        summary_cache.set(cache_key, summary)
+
+        return summary
 
     @staticmethod
     def get_all_experiments() -> list[Experiment]:
@@ -113,12 +172,14 @@ class ExperimentInterface:
         if len(allocations) != len(experiment.experiment_variants):
             return False
 
-        if not ExperimentInterface.experiment_in_progress(experiment_uuid):
+        if not ExperimentService.status_in_progress(experiment.experiment_status):
             return False
 
-        for i, variant_uuid in enumerate(experiment.experiment_variants):
-            ExperimentVariantService.update_allocation(variant_uuid, allocations[i])
+        ExperimentVariantService.update_allocations(
+            dict(zip(experiment.experiment_variants, allocations))
+        )
 
+        ExperimentService.bump_generation(experiment_uuid)
         return True
 
     @staticmethod
@@ -136,12 +197,17 @@ class ExperimentInterface:
         if len(descriptions) != len(experiment.experiment_variants):
             return False
 
-        if not ExperimentInterface.experiment_in_progress(experiment_uuid):
+        if not ExperimentService.status_in_progress(experiment.experiment_status):
             return False
 
-        for i, variant_uuid in enumerate(experiment.experiment_variants):
-            ExperimentVariantRepository.update(
-                variant_uuid, description=descriptions[i]
-            )
+        ExperimentVariantRepository.bulk_update(
+            {
+                variant_uuid: {"description": description}
+                for variant_uuid, description in zip(
+                    experiment.experiment_variants, descriptions
+                )
+            }
+        )
 
+        ExperimentService.bump_generation(experiment_uuid)
         return True
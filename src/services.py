@@ -8,13 +8,20 @@ which only makes sense in the context of an  A/B testing
 application, not in the context of generic database models.
 """
 
+import concurrent.futures
+import functools
+import hashlib
+import http.cookiejar
 import random
+import string
+import threading
 import uuid
 from datetime import datetime
 from typing import Optional, Union
 
 import bcrypt
 import requests
+from requests.adapters import HTTPAdapter
 
 from src.database.models import (
     BaseCollectionModel,
@@ -32,9 +39,84 @@ from src.database.repository import (
     ExperimentRepository,
     ExperimentVariantRepository,
     FunnelEventRepository,
+    ParticipantAssignmentRepository,
     ParticipantToUserRepository,
     UserRepository,
 )
+from src.shared import env
+
+# The bcrypt work factor for new password hashes, existing hashes keep the
+# cost they were made with. Lower costs are faster to hash, but equally faster
+# to brute force, so this should only be lowered for testing
+BCRYPT_COST = int(env["BCRYPT_COST"] or 12)
+
+# Experiment statuses checked on every assignment, built once
+IN_PROGRESS_STATUSES = frozenset(
+    {ExperimentStatus.RUNNING, ExperimentStatus.PAUSED, ExperimentStatus.COMPLETED}
+)
+ENDED_STATUSES = frozenset({ExperimentStatus.STOPPED, ExperimentStatus.COMPLETED})
+# Participants already in these experiments keep their variant,
+# but no new participants are added to them
+NO_NEW_PARTICIPANTS_STATUSES = frozenset(
+    {ExperimentStatus.COMPLETED, ExperimentStatus.PAUSED}
+)
+CLOSED_STATUSES = ENDED_STATUSES | NO_NEW_PARTICIPANTS_STATUSES
+
+
+@functools.lru_cache(maxsize=128)
+def alias_table(
+    weights: tuple[float, ...]
+) -> Optional[tuple[tuple[float, ...], tuple[int, ...]]]:
+    """
+    Vose's alias table for the weights, the probability of keeping each column
+    and the index used otherwise, so a weighted choice takes constant time.
+    The allocations of an experiment rarely change, so the tables are cached
+    by the weights themselves. Returns None if no weight is positive
+    """
+    total = sum(weights)
+    if not weights or total <= 0:
+        return None
+
+    count = len(weights)
+    scaled = [weight * count / total for weight in weights]
+    probabilities = [1.0] * count
+    aliases = list(range(count))
+    small = [index for index, weight in enumerate(scaled) if weight < 1]
+    large = [index for index, weight in enumerate(scaled) if weight >= 1]
+
+    while small and large:
+        small_index = small.pop()
+        large_index = large.pop()
+        probabilities[small_index] = scaled[small_index]
+        aliases[small_index] = large_index
+        scaled[large_index] += scaled[small_index] - 1
+
+        if scaled[large_index] < 1:
+            small.append(large_index)
+        else:
+            large.append(large_index)
+
+    # Anything left is only off from 1 by rounding, and always keeps its column
+    return tuple(probabilities), tuple(aliases)
+
+
+# Bumped whenever an experiment or its participants are changed, so results
+# derived from the experiment can be cached until the next change. This is
+# only seen by the current process, other processes rely on the cache TTLs
+_experiment_generations: dict[uuid.UUID, int] = {}
+
+
+class _DeferredGenerationBumps(threading.local):
+    """
+    Experiments whose participant pushes are queued by the current thread,
+    bumped once the pushes are flushed
+    """
+
+    def __init__(self):
+        self.experiment_uuids: set[uuid.UUID] = set()
+
+
+_deferred_generation_bumps = _DeferredGenerationBumps()
 
 
 class ExperimentService:
@@ -42,6 +124,38 @@ class ExperimentService:
     Service functions for working with experiments
     """
 
+    @staticmethod
+    def generation(experiment_uuid: uuid.UUID) -> int:
+        """
+        How many times the experiment has been changed by this process
+        """
+        return _experiment_generations.get(experiment_uuid, 0)
+
+    @staticmethod
+    def bump_generation(experiment_uuid: uuid.UUID) -> None:
+        """
+        Mark the experiment as changed, for the caches keyed by its generation
+        """
+        _experiment_generations[experiment_uuid] = (
+            _experiment_generations.get(experiment_uuid, 0) + 1
+        )
+
+    @staticmethod
+    def flush_participant_pushes() -> int:
+        """
+        Write the participant pushes queued by the current thread, and bump
+        the generation of the experiments they were queued for. Returns the
+        number of participants that were added
+        """
+        experiment_uuids = _deferred_generation_bumps.experiment_uuids
+        _deferred_generation_bumps.experiment_uuids = set()
+
+        try:
+            return ExperimentVariantRepository.flush_participant_pushes()
+        finally:
+            for experiment_uuid in experiment_uuids:
+                ExperimentService.bump_generation(experiment_uuid)
+
     @staticmethod
     def variant_in_experiment(
         experiment_uuid: uuid.UUID, variant_uuid: uuid.UUID
@@ -53,7 +167,7 @@ class ExperimentService:
         if experiment is None:
             return False
 
-        return variant_uuid in experiment.experiment_variants
+        return experiment.contains_variant(variant_uuid)
 
     @staticmethod
     def add_variant_to_experiment(
@@ -70,6 +184,7 @@ class ExperimentService:
             experiment_uuid, variant_uuid
         )
 
+        ExperimentService.bump_generation(experiment_uuid)
         return added_successfully
 
     @staticmethod
@@ -79,7 +194,12 @@ class ExperimentService:
         """
         Check if a participant is in an experiment
         """
-        variant_uuid = ExperimentService.get_variant_uuid_for_participant(
+        if ParticipantAssignmentRepository.has_assignment(
+            experiment_uuid, participant_uuid
+        ):
+            return True
+
+        variant_uuid = ExperimentService.find_unrecorded_variant(
             experiment_uuid, participant_uuid
         )
 
@@ -88,44 +208,165 @@ class ExperimentService:
     @staticmethod
     def add_participant_to_experiment(
         experiment_uuid: uuid.UUID, participant_uuid: uuid.UUID
-    ) -> uuid.UUID:
+    ) -> Optional[uuid.UUID]:
         """
         Add a participant to an experiment. Returns the UUID of
-        the variant the participant was assigned to
+        the variant the participant was assigned to, or None if the
+        experiment has ended or is paused
         """
-        experiment: Experiment = ExperimentRepository.read(experiment_uuid)
-        if experiment is None:
-            raise Exception("Experiment not found")
-
-        if experiment.experiment_status in [
-            ExperimentStatus.STOPPED,
-            ExperimentStatus.COMPLETED,
-        ]:
-            raise Exception("Experiment has ended")
+        assignable = ExperimentService.get_assignable_experiment(experiment_uuid)
+        if assignable is None:
+            return None
 
-        if len(experiment.experiment_variants) == 0:
-            raise Exception("No variants in experiment")
+        _experiment, variants = assignable
 
         if ExperimentService.participant_in_experiment(
             experiment_uuid, participant_uuid
         ):
             raise Exception("Participant already in experiment")
 
-        variants = [
-            ExperimentVariantService.get_variant(variant_uuid)
-            for variant_uuid in experiment.experiment_variants
-        ]
-        variant_allocations = [variant.allocation for variant in variants]
-        if sum(variant_allocations) == 0:
-            raise Exception("No allocation for any variant")
-
-        selected_variant = random.choices(variants, weights=variant_allocations)[0]
-        ExperimentVariantService.add_participant_to_variant(
+        selected_variant = ExperimentService.choose_variant(
+            variants,
+            ExperimentService.assignment_point(experiment_uuid, participant_uuid),
+        )
+        added = ExperimentVariantService.add_participant_to_variant(
             selected_variant.uuid, participant_uuid
         )
+        ParticipantAssignmentRepository.assign(
+            experiment_uuid, participant_uuid, selected_variant.uuid
+        )
+
+        # A queued push only changes the participant counts once flushed
+        if added is None:
+            _deferred_generation_bumps.experiment_uuids.add(experiment_uuid)
+        else:
+            ExperimentService.bump_generation(experiment_uuid)
 
         return selected_variant.uuid
 
+    @staticmethod
+    def add_participants_to_experiment(
+        experiment_uuid: uuid.UUID, participant_uuids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, uuid.UUID]:
+        """
+        Add many participants to an experiment at once, such as for a backfill.
+        Participants already in the experiment are skipped, whether they have an
+        assignment, are in the participants list of a variant, or are queued to
+        be pushed to one. The assignments are written with a single bulk write,
+        returns the variant UUID each new participant was assigned to. Nobody
+        is added if the experiment has ended or is paused
+        """
+        assignable = ExperimentService.get_assignable_experiment(experiment_uuid)
+        if assignable is None:
+            return {}
+
+        experiment, variants = assignable
+
+        already_assigned = set(
+            ParticipantAssignmentRepository.get_variant_uuids(
+                experiment_uuid, participant_uuids
+            )
+        )
+        already_assigned.update(
+            ExperimentVariantRepository.find_participants_in_variants(
+                experiment.experiment_variants, participant_uuids
+            )
+        )
+        already_assigned.update(
+            ExperimentVariantRepository.deferred_participants(
+                experiment.experiment_variants
+            )
+        )
+
+        assignments = {}
+        for participant_uuid in participant_uuids:
+            if participant_uuid in already_assigned or participant_uuid in assignments:
+                continue
+
+            assignments[participant_uuid] = ExperimentService.choose_variant(
+                variants,
+                ExperimentService.assignment_point(experiment_uuid, participant_uuid),
+            ).uuid
+
+        variant_to_participants: dict[uuid.UUID, list[uuid.UUID]] = {}
+        for participant_uuid, variant_uuid in assignments.items():
+            variant_to_participants.setdefault(variant_uuid, []).append(
+                participant_uuid
+            )
+
+        if variant_to_participants:
+            ExperimentVariantRepository.push_participants(variant_to_participants)
+            ParticipantAssignmentRepository.assign_many(experiment_uuid, assignments)
+            ExperimentService.bump_generation(experiment_uuid)
+
+        return assignments
+
+    @staticmethod
+    def get_assignable_experiment(
+        experiment_uuid: uuid.UUID,
+    ) -> Optional[tuple[Experiment, list[ExperimentVariant]]]:
+        """
+        Get an experiment that participants can be added to, along with its
+        variants in a single query, raising if it does not exist or has no
+        variants. The experiment is always read from the database, as cached
+        reads may lag a status change, and None is returned if it has ended
+        or is paused. The participants of the variants are not fetched
+        """
+        experiment_with_variants = ExperimentRepository.read_with_variants(
+            experiment_uuid, excluded_variant_fields=("participants",)
+        )
+        if experiment_with_variants is None:
+            raise Exception("Experiment not found")
+
+        experiment, variants = experiment_with_variants
+
+        if experiment.experiment_status in CLOSED_STATUSES:
+            return None
+
+        if len(variants) == 0:
+            raise Exception("No variants in experiment")
+
+        return experiment, variants
+
+    @staticmethod
+    def assignment_point(
+        experiment_uuid: uuid.UUID, participant_uuid: uuid.UUID
+    ) -> float:
+        """
+        A point in [0, 1) hashed from the experiment and the participant, so
+        a participant is bucketed the same way every time, without a lookup
+        """
+        digest = hashlib.blake2b(
+            participant_uuid.bytes + experiment_uuid.bytes, digest_size=8
+        ).digest()
+        # Only 53 bits fit in a float, more could round the point up to 1
+        return (int.from_bytes(digest, "big") >> 11) / 2**53
+
+    @staticmethod
+    def choose_variant(
+        variants: list[ExperimentVariant], point: Optional[float] = None
+    ) -> ExperimentVariant:
+        """
+        Choose a variant, weighted by the variant allocations. The point in
+        [0, 1) picks the variant, a random one is used if none is given
+        """
+        if point is None:
+            point = random.random()
+
+        table = alias_table(tuple(variant.allocation for variant in variants))
+        if table is None:
+            raise Exception("No allocation for any variant")
+
+        # The whole part of the scaled point picks a column, and the
+        # fractional part decides between the column and its alias
+        probabilities, aliases = table
+        scaled_point = point * len(variants)
+        column = min(int(scaled_point), len(variants) - 1)
+        if scaled_point - column < probabilities[column]:
+            return variants[column]
+
+        return variants[aliases[column]]
+
     @staticmethod
     def get_experiment(experiment_uuid: uuid.UUID) -> Optional[Experiment]:
         """
@@ -133,6 +374,13 @@ class ExperimentService:
         """
         return ExperimentRepository.read(experiment_uuid)
 
+    @staticmethod
+    def get_status(experiment_uuid: uuid.UUID) -> Optional[ExperimentStatus]:
+        """
+        Get the status of an experiment by its UUID
+        """
+        return ExperimentRepository.get_status(experiment_uuid)
+
     @staticmethod
     def get_variant_uuid_for_participant(
         experiment_uuid: uuid.UUID, participant_uuid: uuid.UUID
@@ -141,39 +389,152 @@ class ExperimentService:
         Get the variant uuid a participant is assigned to in an experiment.
         Returns None if the participant is not in the experiment
         """
-        experiment: Experiment = ExperimentRepository.read(experiment_uuid)
+        variant_uuid = ParticipantAssignmentRepository.get_variant_uuid(
+            experiment_uuid, participant_uuid
+        )
+        if variant_uuid is not None:
+            return variant_uuid
+
+        return ExperimentService.find_unrecorded_variant(
+            experiment_uuid, participant_uuid
+        )
+
+    @staticmethod
+    def get_variant_uuids_for_participants(
+        experiment: Experiment, participant_uuids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, uuid.UUID]:
+        """
+        Get the variant uuid each of many participants is assigned to in an
+        experiment that was already read, keyed by participant uuid. As for
+        get_variant_uuid_for_participant, participants placed directly in a
+        variant are found there as well. Participants that are not in the
+        experiment are left out
+        """
+        variant_uuids = ParticipantAssignmentRepository.get_variant_uuids(
+            experiment.experiment_uuid, participant_uuids
+        )
+        unassigned_uuids = [
+            participant_uuid
+            for participant_uuid in participant_uuids
+            if participant_uuid not in variant_uuids
+        ]
+        if not unassigned_uuids:
+            return variant_uuids
+
+        variant_uuids.update(
+            ExperimentVariantRepository.find_variants_with_participants(
+                experiment.experiment_variants, unassigned_uuids
+            )
+        )
+
+        return variant_uuids
+
+    @staticmethod
+    def find_unrecorded_variant(
+        experiment_uuid: uuid.UUID,
+        participant_uuid: uuid.UUID,
+        experiment: Optional[Experiment] = None,
+    ) -> Optional[uuid.UUID]:
+        """
+        Participants can be placed directly in the participants list of a
+        variant, without an assignment. Those are looked up in the variants
+        of the experiment, this only reads, backfill_assignments records
+        them. The experiment is read, unless one that was already read is given
+        """
+        if experiment is None:
+            experiment = ExperimentRepository.read(experiment_uuid)
         if experiment is None:
             return None
 
-        for variant_uuid in experiment.experiment_variants:
-            in_variant = ExperimentVariantService.participant_in_variant(
-                variant_uuid, participant_uuid
-            )
-            if in_variant:
-                return variant_uuid
-        return None
+        return ExperimentVariantRepository.find_variant_with_participant(
+            experiment.experiment_variants, participant_uuid
+        )
+
+    @staticmethod
+    def backfill_assignments(experiment_uuid: uuid.UUID) -> int:
+        """
+        Record an assignment for every participant placed directly in the
+        participants list of a variant of the experiment. Lookups find those
+        participants without one, but never write, so this is run as a
+        migration. Returns the number of participants recorded
+        """
+        experiment: Experiment = ExperimentRepository.read(
+            experiment_uuid, use_cache=False
+        )
+        if experiment is None:
+            raise Exception("Experiment not found")
+
+        listed_variants: dict[uuid.UUID, uuid.UUID] = {}
+        for variant in ExperimentVariantRepository.read_many(
+            experiment.experiment_variants
+        ):
+            for participant_uuid in variant.participants:
+                listed_variants.setdefault(participant_uuid, variant.variant_uuid)
+
+        recorded = ParticipantAssignmentRepository.get_variant_uuids(
+            experiment_uuid, list(listed_variants)
+        )
+        unrecorded = {
+            participant_uuid: variant_uuid
+            for participant_uuid, variant_uuid in listed_variants.items()
+            if participant_uuid not in recorded
+        }
+        if unrecorded:
+            ParticipantAssignmentRepository.assign_many(experiment_uuid, unrecorded)
+
+        return len(unrecorded)
+
+    @staticmethod
+    def get_variant_name_for_participant(
+        experiment: Experiment, participant_uuid: uuid.UUID
+    ) -> Optional[str]:
+        """
+        Get the name of the variant a participant is assigned to in an experiment,
+        joined in a single query for participants with an assignment.
+        Returns None if the participant is not in the experiment
+        """
+        variant_name = ParticipantAssignmentRepository.get_variant_name(
+            experiment.experiment_uuid, participant_uuid
+        )
+        if variant_name is not None:
+            return variant_name
+
+        # The assignment was just probed, so only the variants are left to check
+        variant_uuid = ExperimentService.find_unrecorded_variant(
+            experiment.experiment_uuid, participant_uuid, experiment
+        )
+        if variant_uuid is None:
+            return None
+
+        return ExperimentVariantRepository.read_field(variant_uuid, "name")
 
     @staticmethod
     def experiment_in_progress(experiment_uuid: uuid.UUID) -> bool:
         """
         Check if the experiment is in progress/has ended in a valid state.
         """
-        experiment: Experiment = ExperimentRepository.read(experiment_uuid)
-        if experiment is None:
+        experiment_status = ExperimentRepository.get_status(experiment_uuid)
+        if experiment_status is None:
             raise Exception("Experiment not found")
 
-        return experiment.experiment_status in [
-            ExperimentStatus.RUNNING,
-            ExperimentStatus.PAUSED,
-            ExperimentStatus.COMPLETED,
-        ]
+        return ExperimentService.status_in_progress(experiment_status)
+
+    @staticmethod
+    def status_in_progress(experiment_status: ExperimentStatus) -> bool:
+        """
+        Check if the status is in progress/has ended in a valid state,
+        for an experiment that has already been read
+        """
+        return experiment_status in IN_PROGRESS_STATUSES
 
     @staticmethod
     def start_experiment(experiment_uuid: uuid.UUID) -> ExperimentStatus:
         """
         Attempts to begin an experiment. Returns the new status of the experiment
         """
-        experiment: Experiment = ExperimentRepository.read(experiment_uuid)
+        experiment: Experiment = ExperimentRepository.read(
+            experiment_uuid, use_cache=False
+        )
         if experiment is None:
             raise Exception("Experiment not found")
 
@@ -181,10 +542,7 @@ class ExperimentService:
             print("Experiment already running")
             return ExperimentStatus.RUNNING
 
-        if experiment.experiment_status in [
-            ExperimentStatus.STOPPED,
-            ExperimentStatus.COMPLETED,
-        ]:
+        if experiment.experiment_status in ENDED_STATUSES:
             print("Experiment has ended")
             return experiment.experiment_status
 
@@ -198,6 +556,7 @@ class ExperimentService:
             updated_experiment: Experiment = ExperimentRepository.update(
                 experiment_uuid, experiment_status=ExperimentStatus.RUNNING
             )
+        ExperimentService.bump_generation(experiment_uuid)
         return updated_experiment.experiment_status
 
     @staticmethod
@@ -205,7 +564,9 @@ class ExperimentService:
         """
         Attempts to pause an experiment. Returns the new status of the experiment
         """
-        experiment: Experiment = ExperimentRepository.read(experiment_uuid)
+        experiment: Experiment = ExperimentRepository.read(
+            experiment_uuid, use_cache=False
+        )
         if experiment is None:
             raise Exception("Experiment not found")
 
@@ -217,16 +578,14 @@ class ExperimentService:
             print("Experiment has not started")
             return ExperimentStatus.CREATED
 
-        if experiment.experiment_status in [
-            ExperimentStatus.STOPPED,
-            ExperimentStatus.COMPLETED,
-        ]:
+        if experiment.experiment_status in ENDED_STATUSES:
             print("Experiment has ended")
             return experiment.experiment_status
 
         updated_experiment: Experiment = ExperimentRepository.update(
             experiment_uuid, experiment_status=ExperimentStatus.PAUSED
         )
+        ExperimentService.bump_generation(experiment_uuid)
         return updated_experiment.experiment_status
 
     @staticmethod
@@ -237,20 +596,20 @@ class ExperimentService:
         """
         Attempts to move the experiment to a stopped or completed state. Returns the new status of the experiment
         """
-        experiment: Experiment = ExperimentRepository.read(experiment_uuid)
+        experiment: Experiment = ExperimentRepository.read(
+            experiment_uuid, use_cache=False
+        )
         if experiment is None:
             raise Exception("Experiment not found")
 
-        if experiment.experiment_status in [
-            ExperimentStatus.STOPPED,
-            ExperimentStatus.COMPLETED,
-        ]:
+        if experiment.experiment_status in ENDED_STATUSES:
             print("Experiment already ended")
             return experiment.experiment_status
 
         updated_experiment: Experiment = ExperimentRepository.update(
             experiment_uuid, experiment_status=end_state, end_date=datetime.now()
         )
+        ExperimentService.bump_generation(experiment_uuid)
         return updated_experiment.experiment_status
 
     @staticmethod
@@ -291,6 +650,23 @@ class ExperimentVariantService:
             variant_uuid, allocation=new_allocation
         )
 
+    @staticmethod
+    def update_allocations(variant_to_allocation: dict[uuid.UUID, float]) -> int:
+        """
+        Update the allocations of many experiment variants with a single write,
+        nothing is written if any allocation is invalid. Returns the number of
+        variants that were modified
+        """
+        if any(allocation < 0 for allocation in variant_to_allocation.values()):
+            raise Exception("Allocation must be a positive number")
+
+        return ExperimentVariantRepository.bulk_update(
+            {
+                variant_uuid: {"allocation": allocation}
+                for variant_uuid, allocation in variant_to_allocation.items()
+            }
+        )
+
     @staticmethod
     def participant_in_variant(
         variant_uuid: uuid.UUID, participant_uuid: uuid.UUID
@@ -298,29 +674,36 @@ class ExperimentVariantService:
         """
         Check if a participant is in an experiment variant
         """
-        variant: ExperimentVariant = ExperimentVariantRepository.read(variant_uuid)
-        if variant is None:
-            return False
-
-        return participant_uuid in variant.participants
+        return ExperimentVariantRepository.has_participant(
+            variant_uuid, participant_uuid
+        )
 
     @staticmethod
     def add_participant_to_variant(
         variant_uuid: uuid.UUID, participant_uuid: uuid.UUID
-    ) -> bool:
+    ) -> Optional[bool]:
         """
-        Add a participant to an experiment variant
+        Add a participant to an experiment variant. Returns whether the
+        participant was added, or None while participant pushes are deferred
         """
-        variant: ExperimentVariant = ExperimentVariantRepository.read(variant_uuid)
-        if variant is None:
-            raise Exception("Variant not found")
-
         added_successfully = ExperimentVariantRepository.push_participant(
             variant_uuid, participant_uuid
         )
 
         return added_successfully
 
+    @staticmethod
+    def add_participants_to_variant(
+        variant_uuid: uuid.UUID, participant_uuids: list[uuid.UUID]
+    ) -> bool:
+        """
+        Add many participants to an experiment variant with a single write.
+        Returns whether any of them were not already in the variant
+        """
+        return ExperimentVariantRepository.push_participant_many(
+            variant_uuid, participant_uuids
+        )
+
     @staticmethod
     def get_variant(variant_uuid: uuid.UUID) -> Optional[ExperimentVariant]:
         """
@@ -333,13 +716,16 @@ COMMON_PASSWORDS = {
     "password",
     "123456",
 }
-INVALID_CHARACTERS = {
-    "@",
-    "#",
-    "%",
-    "{",
-    "}",
-}
+# Characters usernames may not contain, frozen so it cannot change at runtime
+INVALID_CHARACTERS = frozenset(
+    {
+        "@",
+        "#",
+        "%",
+        "{",
+        "}",
+    }
+)
 
 
 class AuthService:
@@ -358,14 +744,14 @@ class AuthService:
         if not AuthService.validate_username(username):
             raise Exception("Username does not meet requirements")
 
-        salt = bcrypt.gensalt()
-        hashed_password = bcrypt.hashpw(password.encode("utf-8"), salt)
+        hashed_password = bcrypt.hashpw(
+            password.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_COST)
+        )
         new_user_uuid = uuid.uuid4()
 
         new_user = UserRepository.create(
             username=username,
             hashed_password=hashed_password,
-            random_salt=salt,
             user_uuid=new_user_uuid,
         )
 
@@ -384,11 +770,18 @@ class AuthService:
         Validate a user's credentials
         """
         user = AuthService.get_user(user_uuid)
-        if user is None:
+        if user is None or user.username != username:
             return False
 
-        hashed_password = bcrypt.hashpw(password.encode("utf-8"), user.random_salt)
-        return hashed_password == user.hashed_password and user.username == username
+        return AuthService.check_user_password(user, password)
+
+    @staticmethod
+    def check_user_password(user: User, password: str) -> bool:
+        """
+        Check a password against a user that has already been read
+        """
+        # checkpw reads the salt from the hash, and compares in constant time
+        return bcrypt.checkpw(password.encode("utf-8"), user.hashed_password)
 
     @staticmethod
     def validate_username(username: str) -> bool:
@@ -398,7 +791,7 @@ class AuthService:
         if len(username) < 5 or len(username) > 50:
             return False
 
-        if any(char in INVALID_CHARACTERS for char in username):
+        if not INVALID_CHARACTERS.isdisjoint(username):
             return False
 
         current_user = UserRepository.get_user_by_username(username)
@@ -449,13 +842,31 @@ class ParticipantService:
     @staticmethod
     def create_participant(participant_uuid: uuid.UUID) -> ExperimentParticipant:
         """
-        Create a new participant
+        Create a new participant, the unique index on the
+        participant UUID detects participants that already exist
         """
-        current_participant = ExperimentParticipantRepository.read(participant_uuid)
-        if current_participant is not None:
+        participant = ExperimentParticipantRepository.create(
+            participant_uuid=participant_uuid
+        )
+        if participant is None:
             raise Exception("Participant already exists")
 
-        return ExperimentParticipantRepository.create(participant_uuid=participant_uuid)
+        return participant
+
+    @staticmethod
+    def create_participants(
+        participant_uuids: list[uuid.UUID],
+    ) -> list[ExperimentParticipant]:
+        """
+        Create many participants with a single insert. Participants that
+        already exist are skipped, returns the participants that were created
+        """
+        return ExperimentParticipantRepository.create_many(
+            [
+                ExperimentParticipant(participant_uuid=participant_uuid)
+                for participant_uuid in participant_uuids
+            ]
+        )
 
     @staticmethod
     def get_participant(participant_uuid: uuid.UUID) -> Optional[ExperimentParticipant]:
@@ -486,6 +897,27 @@ class ParticipantService:
         )
 
 
+LOAD_URL_WORKERS = 32
+
+
+@functools.lru_cache(maxsize=None)
+def load_url_session() -> requests.Session:
+    """
+    A session that keeps connections alive between loads, but never keeps
+    cookies, so that every load is seen as a new visitor. It is built on
+    first use, so importing the services opens nothing
+    """
+    session = requests.Session()
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(
+        pool_connections=LOAD_URL_WORKERS, pool_maxsize=LOAD_URL_WORKERS
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    return session
+
+
 class Helpful:
     """
     Helpful methods overall
@@ -502,8 +934,7 @@ class Helpful:
         participant_uuids, and the variants.
         """
         participant_uuids = [uuid.uuid4() for _i in range(num_participants)]
-        for p_uuid in participant_uuids:
-            ParticipantService.create_participant(p_uuid)
+        ParticipantService.create_participants(participant_uuids)
 
         variant_names = [
             "red_no_text",
@@ -517,11 +948,7 @@ class Helpful:
             new_variant = ExperimentVariantRepository.create(
                 name=v_name,
                 description="variations on how to display the button",
-                participants=[
-                    participant_uuids[p_index]
-                    for p_index in range(num_participants)
-                    if p_index % 5 == i
-                ],
+                participants=participant_uuids[i :: len(variant_names)],
             )
             variants.append(new_variant)
 
@@ -530,6 +957,15 @@ class Helpful:
             description="Increase engagement by changing the color and text of the button",
             experiment_variants=[v.variant_uuid for v in variants],
         )
+        # The participants were placed in the variants directly
+        ParticipantAssignmentRepository.assign_many(
+            experiment.experiment_uuid,
+            {
+                participant_uuid: variant.variant_uuid
+                for variant in variants
+                for participant_uuid in variant.participants
+            },
+        )
 
         return {
             "experiment": experiment,
@@ -542,18 +978,18 @@ class Helpful:
         """
         Generate a random string of a given length
         """
-        return "".join(
-            random.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(length)
-        )
+        return "".join(random.choices(string.ascii_lowercase, k=length))
 
     @staticmethod
     def load_url_x_times(url: str, x: int) -> None:
         """
         Load a URL x times, useful for creating new experiment
-        participants
+        participants. The loads run concurrently over pooled connections
         """
-        for _i in range(x):
-            requests.get(url)
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=LOAD_URL_WORKERS
+        ) as executor:
+            list(executor.map(load_url_session().get, [url] * x))
 
 
 class FunnelEventService:
@@ -583,6 +1019,14 @@ class FunnelEventService:
 
         return new_event
 
+    @staticmethod
+    def create_funnel_events(events: list[FunnelEvent]) -> list[FunnelEvent]:
+        """
+        Create many funnel events with a single write, such as the
+        events collected while handling a request
+        """
+        return FunnelEventRepository.create_many(events)
+
     @staticmethod
     def attempt_to_link_participant(
         session_uuid: uuid.UUID,
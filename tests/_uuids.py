@@ -0,0 +1,32 @@
+"""
+UUIDs for the tests. UUIDs that only need to match nothing come from
+a counter. Code under test that calls uuid.uuid4 gets seeded_uuid4,
+see conftest
+"""
+
+import itertools
+import random
+import uuid
+
+_unused_uuid_counter = itertools.count(1)
+
+
+def unused_uuid() -> uuid.UUID:
+    """
+    A UUID that no model is given, for looking up models that do not
+    exist. The UUIDs count up from 1, so they never match a version 4
+    UUID, and need no random bytes at all
+    """
+    return uuid.UUID(int=next(_unused_uuid_counter))
+
+
+_seeded_random = random.Random("experimentation")
+
+
+def seeded_uuid4() -> uuid.UUID:
+    """
+    A version 4 UUID from random.getrandbits rather than os.urandom.
+    The tests do not need cryptographically random UUIDs, only unique ones
+    within a run, which starts from empty testing databases
+    """
+    return uuid.UUID(int=_seeded_random.getrandbits(128), version=4)
@@ -0,0 +1,144 @@
+# pylint: disable=missing-docstring,redefined-outer-name,unused-argument
+"""
+Test data shared by the service tests. The fixtures are session scoped,
+so the data is only created once, and only for the tests that use it.
+Runs with tests marked db start from empty testing databases, other
+runs do not touch the database at all
+"""
+
+import uuid
+
+import pytest
+from _uuids import seeded_uuid4
+
+from src.database.crud import read_cache
+from src.database.models import (
+    Experiment,
+    ExperimentParticipant,
+    ExperimentVariant,
+    FunnelEvent,
+    ParticipantToUser,
+    User,
+)
+from src.database.repository import (
+    ExperimentParticipantRepository,
+    ExperimentRepository,
+    ExperimentVariantRepository,
+)
+from src.services import AuthService, ParticipantService
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _seeded_uuid4():
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(uuid, "uuid4", seeded_uuid4)
+        yield
+
+
+@pytest.fixture(scope="session")
+def empty_databases():
+    from src.shared import db  # pylint: disable=import-outside-toplevel
+
+    db.drop_testing_databases([Experiment.DB_NAME, FunnelEvent.DB_NAME])
+    read_cache.clear()
+
+    return db
+
+
+@pytest.fixture
+def db(empty_databases):
+    return empty_databases
+
+
+@pytest.fixture(autouse=True)
+def _database(request):
+    if request.node.get_closest_marker("db") is not None:
+        request.getfixturevalue("empty_databases")
+
+
+@pytest.fixture(scope="session")
+def marvel_participants(empty_databases) -> list[ExperimentParticipant]:
+    return ExperimentParticipantRepository.create_many(
+        [ExperimentParticipant(participant_uuid=uuid.uuid4()) for _i in range(3)]
+    )
+
+
+@pytest.fixture(scope="session")
+def dc_participants(empty_databases) -> list[ExperimentParticipant]:
+    return ExperimentParticipantRepository.create_many(
+        [ExperimentParticipant(participant_uuid=uuid.uuid4()) for _i in range(3)]
+    )
+
+
+@pytest.fixture(scope="session")
+def mcu_variant(marvel_participants) -> ExperimentVariant:
+    return ExperimentVariantRepository.create(
+        name="Marvel",
+        description="Movies from the Marvel universe",
+        allocation=0.5,
+        participants=[
+            participant.participant_uuid for participant in marvel_participants
+        ],
+    )
+
+
+@pytest.fixture(scope="session")
+def dceu_variant(dc_participants) -> ExperimentVariant:
+    return ExperimentVariantRepository.create(
+        name="DC",
+        description="Movies from the DC universe",
+        allocation=0.5,
+        participants=[participant.participant_uuid for participant in dc_participants],
+    )
+
+
+@pytest.fixture(scope="session")
+def test_experiment(mcu_variant, dceu_variant) -> Experiment:
+    return ExperimentRepository.create(
+        name="Marvel vs DC",
+        description="Testing which movie universe is more popular",
+        experiment_variants=[mcu_variant.variant_uuid, dceu_variant.variant_uuid],
+    )
+
+
+@pytest.fixture
+def listed_experiments(empty_databases) -> list[Experiment]:
+    # Created together with one insert, for tests that need several
+    return ExperimentRepository.create_many(
+        [Experiment(name=f"listed {i}") for i in range(3)]
+    )
+
+
+@pytest.fixture(scope="session")
+def rando(empty_databases) -> ExperimentParticipant:
+    return ExperimentParticipantRepository.create()
+
+
+@pytest.fixture(scope="session")
+def southern_variant(rando) -> ExperimentVariant:
+    return ExperimentVariantRepository.create(
+        name="Southern Variant",
+        description="The good ole south",
+        variant_uuid=uuid.uuid4(),
+        participants=[rando.participant_uuid],
+    )
+
+
+@pytest.fixture(scope="session")
+def linked_participant(empty_databases) -> ParticipantToUser:
+    participant = ParticipantService.create_participant(uuid.uuid4())
+    return ParticipantService.link_participant_to_user(
+        participant.participant_uuid, uuid.uuid4()
+    )
+
+
+@pytest.fixture(scope="session")
+def marvelous_password() -> str:
+    return "other_password!"
+
+
+@pytest.fixture(scope="session")
+def marvelous_user(empty_databases, marvelous_password) -> User:
+    # Hashing the password is the slow part of creating a user, so the
+    # tests that only read the user share this one
+    return AuthService.create_user("marvelous_mx", marvelous_password)
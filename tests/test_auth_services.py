@@ -3,12 +3,14 @@
 import random
 import uuid
 
+import bcrypt
 import pytest
 
-from src.database.models import User
 from src.database.repository import UserRepository
 from src.services import AuthService
 
+pytestmark = pytest.mark.db
+
 
 def random_string(length: int) -> str:
     letters = [chr(random.randint(97, 122)) for i in range(length)]
@@ -33,31 +35,19 @@ def test_validate_username():
     assert AuthService.validate_username("*" * 51) is False
 
 
-def test_get_user():
-    current_user = UserRepository.get_user_by_username("marvelous_ms")
-    if current_user is not None:
-        UserRepository.delete(current_user.user_uuid)
-
-    test_pass = "password123!"
-    test_name = "marvelous_ms"
-    user: User = AuthService.create_user(test_name, test_pass)
-
-    assert AuthService.get_user(user.user_uuid) == user
+def test_get_user(marvelous_user):
+    assert AuthService.get_user(marvelous_user.user_uuid) == marvelous_user
     assert AuthService.get_user(uuid.uuid4()) is None
 
 
 def test_create_user():
-    current_user = UserRepository.get_user_by_username("marvelous_mx")
-    if current_user is not None:
-        UserRepository.delete(current_user.user_uuid)
-
-    test_pass = "other_password!"
-    test_name = "marvelous_mx"
+    test_pass = "password123!"
+    test_name = random_string(10)
     user: User = AuthService.create_user(test_name, test_pass)
 
     assert user.username == test_name
     assert user.hashed_password != test_pass
-    assert user.random_salt is not None
+    assert bcrypt.checkpw(test_pass.encode("utf-8"), user.hashed_password)
     assert AuthService.validate_auth(user.user_uuid, test_name, test_pass)
 
     with pytest.raises(Exception) as e_info:
@@ -69,6 +59,22 @@ def test_create_user():
     assert "Password does not meet requirements" in str(e_info.value)
 
 
+def test_validate_auth(marvelous_user, marvelous_password):
+    user = marvelous_user
+    test_name = user.username
+    test_pass = marvelous_password
+
+    assert AuthService.validate_auth(user.user_uuid, test_name, test_pass)
+    assert not AuthService.validate_auth(user.user_uuid, test_name, "wrong_password!")
+    assert not AuthService.validate_auth(user.user_uuid, "other_name", test_pass)
+    assert not AuthService.validate_auth(uuid.uuid4(), test_name, test_pass)
+
+
+def test_check_user_password(marvelous_user, marvelous_password):
+    assert AuthService.check_user_password(marvelous_user, marvelous_password)
+    assert not AuthService.check_user_password(marvelous_user, "wrong_password!")
+
+
 def test_update_username():
     old_name = random_string(10)
     new_user = AuthService.create_user(
@@ -83,3 +89,11 @@ def test_update_username():
     assert updated_user
 
     assert AuthService.get_user(new_user.user_uuid).username == new_name
+
+
+def test_username_unique():
+    username = random_string(10)
+    user = UserRepository.create(username=username)
+
+    assert UserRepository.create(username=username) is None
+    assert UserRepository.get_user_by_username(username) == user
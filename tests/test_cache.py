@@ -0,0 +1,109 @@
+# pylint: disable=missing-docstring
+
+import time
+import uuid
+
+import pytest
+
+from src.database.cache import TTLCache
+from src.database.crud import ExperimentCrud, read_cache
+from src.database.models import Experiment, ExperimentVariant
+from src.database.repository import ExperimentRepository, ExperimentVariantRepository
+
+
+def test_get_and_set():
+    cache = TTLCache()
+    assert cache.get("missing") is None
+
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+
+    cache.delete("key")
+    assert cache.get("key") is None
+
+
+def test_expiry():
+    cache = TTLCache(ttl=0.01)
+    cache.set("short", "lived")
+    cache.set("long", "lived", ttl=60)
+
+    time.sleep(0.02)
+
+    assert cache.get("short") is None
+    assert cache.get("long") == "lived"
+
+
+def test_maxsize():
+    cache = TTLCache(maxsize=2)
+    cache.set("first", 1)
+    cache.set("second", 2)
+    cache.set("third", 3)
+
+    assert len(cache) == 2
+    assert cache.get("first") is None
+    assert cache.get("third") == 3
+
+
+@pytest.mark.db
+def test_read_cache_invalidation(db):
+    experiment: Experiment = ExperimentRepository.create(name="cached")
+    cached_experiment = ExperimentCrud.read(db, experiment.experiment_uuid)
+    cached_experiment.experiment_variants.append(uuid.uuid4())
+
+    assert ExperimentCrud.read(db, experiment.experiment_uuid).experiment_variants == []
+
+    ExperimentRepository.update(experiment.experiment_uuid, name="updated")
+    assert ExperimentCrud.read(db, experiment.experiment_uuid).name == "updated"
+
+    read_cache.clear()
+    assert ExperimentCrud.read(db, experiment.experiment_uuid).name == "updated"
+
+
+@pytest.mark.db
+def test_read_skipping_cache(db):
+    experiment: Experiment = ExperimentRepository.create(name="cached")
+    ExperimentRepository.read(experiment.experiment_uuid)
+
+    db.get_collection(Experiment).update_one(
+        {"experiment_uuid": experiment.experiment_uuid},
+        {"$set": {"name": "changed elsewhere"}},
+    )
+
+    assert ExperimentRepository.read(experiment.experiment_uuid).name == "cached"
+    assert (
+        ExperimentRepository.read(experiment.experiment_uuid, use_cache=False).name
+        == "changed elsewhere"
+    )
+
+
+@pytest.mark.db
+def test_variant_cache_excludes_participants(db):
+    variant: ExperimentVariant = ExperimentVariantRepository.create(
+        name="cached", participants=[uuid.uuid4()]
+    )
+    excluded = ("participants",)
+    assert (
+        ExperimentVariantRepository.read(
+            variant.variant_uuid, excluded_fields=excluded
+        ).participants
+        == []
+    )
+
+    db.get_collection(ExperimentVariant).update_one(
+        {"variant_uuid": variant.variant_uuid},
+        {"$set": {"name": "changed elsewhere"}},
+    )
+
+    # Reads without the participants are cached, reads with them are not
+    assert (
+        ExperimentVariantRepository.read(
+            variant.variant_uuid, excluded_fields=excluded
+        ).name
+        == "cached"
+    )
+    assert ExperimentVariantRepository.read_field(variant.variant_uuid, "name") == (
+        "cached"
+    )
+    full_variant = ExperimentVariantRepository.read(variant.variant_uuid)
+    assert full_variant.name == "changed elsewhere"
+    assert full_variant.participants == variant.participants
@@ -3,23 +3,62 @@
 import uuid
 
 import pytest
+from _uuids import unused_uuid
 
 from src.database.crud import ExperimentCrud
-from src.database.models import Experiment, ExperimentStatus
-from src.shared import db
+from src.database.models import (
+    Experiment,
+    ExperimentParticipant,
+    ExperimentStatus,
+    ExperimentVariant,
+    FunnelEvent,
+    ParticipantAssignment,
+    ParticipantToUser,
+    User,
+)
+
+pytestmark = pytest.mark.db
 
 
 def test_model_class():
     assert ExperimentCrud.model_class() == Experiment
 
 
-def test_empty_create():
+@pytest.mark.parametrize(
+    "model_class, expected_keys",
+    [
+        (Experiment, [[("experiment_uuid", 1)]]),
+        (ExperimentVariant, [[("variant_uuid", 1)], [("participants", 1)]]),
+        (ExperimentParticipant, [[("participant_uuid", 1)]]),
+        (
+            ParticipantAssignment,
+            [
+                [("assignment_uuid", 1)],
+                [("experiment_uuid", 1), ("participant_uuid", 1)],
+            ],
+        ),
+        (User, [[("user_uuid", 1)], [("username", 1)]]),
+        (ParticipantToUser, [[("participant_uuid", 1)]]),
+        (FunnelEvent, [[("event_uuid", 1)]]),
+    ],
+)
+def test_indexes(model_class, expected_keys, db):
+    index_keys = [
+        list(index["key"])
+        for index in db.get_collection(model_class).index_information().values()
+    ]
+
+    for keys in expected_keys:
+        assert keys in index_keys
+
+
+def test_empty_create(db):
     experiment = Experiment()
     created_uuid = ExperimentCrud.create(db, experiment)
     assert created_uuid is not None
 
 
-def test_create():
+def test_create(db):
     experiment_uuid = uuid.uuid4()
     new_experiment = Experiment(
         name="hello world",
@@ -44,8 +83,8 @@ def test_create():
     assert created_uuid is None
 
 
-def test_read():
-    assert ExperimentCrud.read(db, uuid.uuid4()) is None
+def test_read(db):
+    assert ExperimentCrud.read(db, unused_uuid()) is None
 
     new_experiment = Experiment()
     created_uuid = ExperimentCrud.create(db, new_experiment)
@@ -59,52 +98,49 @@ def test_read():
     assert experiment.experiment_status == ExperimentStatus.CREATED
 
 
-def test_update_no_uuid():
+def test_update_no_uuid(db):
     with pytest.raises(Exception) as e_info:
         ExperimentCrud.update(db, Experiment())
 
     assert "Model does not exist" in str(e_info.value)
 
 
-def test_update_no_model():
+def test_update_no_model(db):
     with pytest.raises(Exception) as e_info:
-        ExperimentCrud.update(db, Experiment(experiment_uuid=uuid.uuid4()))
+        ExperimentCrud.update(db, Experiment(experiment_uuid=unused_uuid()))
 
     assert "Model does not exist" in str(e_info.value)
 
 
-def test_update():
-    new_experiment = Experiment()
-    created_uuid = ExperimentCrud.create(db, new_experiment)
-    experiment: Experiment = ExperimentCrud.read(db, created_uuid)
+def test_update(db):
+    created_uuid = ExperimentCrud.create(db, Experiment())
+    experiment = Experiment(experiment_uuid=created_uuid)
 
     experiment.name = "hello world"
     experiment.description = "this is not a test"
     experiment.experiment_status = "running"
     experiment.experiment_variants = [uuid.uuid4(), uuid.uuid4(), uuid.uuid4()]
 
-    updated = ExperimentCrud.update(db, experiment)
-
-    assert updated
-
-    updated_experiment: Experiment = ExperimentCrud.read(db, created_uuid)
+    updated_experiment: Experiment = ExperimentCrud.update(db, experiment)
 
+    assert updated_experiment.experiment_uuid == created_uuid
     assert updated_experiment.name == "hello world"
     assert updated_experiment.description == "this is not a test"
     assert updated_experiment.experiment_status == ExperimentStatus.RUNNING
     assert len(updated_experiment.experiment_variants) == 3
 
 
-def test_delete():
-    new_experiment = Experiment()
-    created_uuid = ExperimentCrud.create(db, new_experiment)
+def test_update_unchanged(db):
+    created_uuid = ExperimentCrud.create(db, Experiment(name="no changes"))
     experiment: Experiment = ExperimentCrud.read(db, created_uuid)
 
-    assert experiment is not None
+    assert ExperimentCrud.update(db, experiment)
+
 
-    deleted = ExperimentCrud.delete(db, experiment.experiment_uuid)
+def test_delete(db):
+    created_uuid = ExperimentCrud.create(db, Experiment())
 
-    assert deleted
+    assert ExperimentCrud.delete(db, created_uuid) == created_uuid
 
     no_experiment = ExperimentCrud.read(db, created_uuid)
     assert no_experiment is None
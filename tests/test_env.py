@@ -6,9 +6,26 @@
 # is free, and it means all test are "integration" tests
 # by default. Offline testing can be explored in the future,
 # or locally through env variables
+import pytest
+
 from src.env import Env
-from src.shared import db
 
 
-def test_init():
+@pytest.mark.db
+def test_init(db):
     assert db.env.env_stage == Env.load_current_env().env_stage
+
+
+def test_values_read_once(monkeypatch):
+    env_stage = Env.load_current_env().env_stage
+    env = Env(env_stage)
+    monkeypatch.setenv("ENV_TEST_VARIABLE", "set later")
+
+    assert env["ENV_TEST_VARIABLE"] is None
+    assert Env(env_stage)["ENV_TEST_VARIABLE"] == "set later"
+
+
+@pytest.mark.db
+def test_shared_env(db):
+    assert Env.load_current_env() is Env.load_current_env()
+    assert db.env is Env.for_stage(db.env.env_stage)
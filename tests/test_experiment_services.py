@@ -3,6 +3,7 @@ import uuid
 from datetime import datetime, timedelta
 
 import pytest
+from _uuids import unused_uuid
 
 from src.database.models import (
     Experiment,
@@ -14,52 +15,26 @@ from src.database.repository import (
     ExperimentParticipantRepository,
     ExperimentRepository,
     ExperimentVariantRepository,
+    ParticipantAssignmentRepository,
 )
 from src.services import (
     AuthService,
     ExperimentService,
     ExperimentVariantService,
+    Helpful,
     ParticipantService,
+    alias_table,
 )
 
+pytestmark = pytest.mark.db
+
 # Setup some test data
-yesterday = datetime.now() - timedelta(days=1)
 today = datetime.now()
-next_week = datetime.now() + timedelta(days=7)
-
-
-marvel_participant_uuids = [uuid.uuid4() for _i in range(3)]
-marvel_participants: list[ExperimentParticipant] = [
-    ExperimentParticipantRepository.create(participant_uuid=uuid)
-    for uuid in marvel_participant_uuids
-]
-
-dc_participant_uuids = [uuid.uuid4() for _i in range(3)]
-dc_participants: list[ExperimentParticipant] = [
-    ExperimentParticipantRepository.create(participant_uuid=uuid)
-    for uuid in dc_participant_uuids
-]
-mcu_variant: ExperimentVariant = ExperimentVariantRepository.create(
-    name="Marvel",
-    description="Movies from the Marvel universe",
-    allocation=0.5,
-    participants=marvel_participant_uuids,
-)
-dceu_variant: ExperimentVariant = ExperimentVariantRepository.create(
-    name="DC",
-    description="Movies from the DC universe",
-    allocation=0.5,
-    participants=dc_participant_uuids,
-)
-
-test_experiment: Experiment = ExperimentRepository.create(
-    name="Marvel vs DC",
-    description="Testing which movie universe is more popular",
-    experiment_variants=[mcu_variant.variant_uuid, dceu_variant.variant_uuid],
-)
+yesterday = today - timedelta(days=1)
+next_week = today + timedelta(days=7)
 
 
-def test_variant_in_experiment():
+def test_variant_in_experiment(test_experiment, mcu_variant, dceu_variant):
     assert ExperimentService.variant_in_experiment(
         test_experiment.experiment_uuid, mcu_variant.variant_uuid
     )
@@ -67,17 +42,17 @@ def test_variant_in_experiment():
         test_experiment.experiment_uuid, dceu_variant.variant_uuid
     )
     assert not ExperimentService.variant_in_experiment(
-        test_experiment.experiment_uuid, uuid.uuid4()
+        test_experiment.experiment_uuid, unused_uuid()
     )
     assert not ExperimentService.variant_in_experiment(
-        uuid.uuid4(), mcu_variant.variant_uuid
+        unused_uuid(), mcu_variant.variant_uuid
     )
 
 
-def test_experiment_in_progress():
+def test_experiment_in_progress(test_experiment):
     assert not ExperimentService.experiment_in_progress(test_experiment.experiment_uuid)
     with pytest.raises(Exception) as e_info:
-        ExperimentService.experiment_in_progress(uuid.uuid4())
+        ExperimentService.experiment_in_progress(unused_uuid())
     assert "Experiment not found" in str(e_info.value)
 
     misc_experiment: Experiment = ExperimentRepository.create(
@@ -98,7 +73,7 @@ def test_experiment_in_progress():
     assert not ExperimentService.experiment_in_progress(misc_experiment.experiment_uuid)
 
 
-def test_add_variant_to_experiment():
+def test_add_variant_to_experiment(test_experiment, mcu_variant, dceu_variant):
     assert not ExperimentService.add_variant_to_experiment(
         test_experiment.experiment_uuid, mcu_variant.variant_uuid
     )
@@ -111,7 +86,7 @@ def test_add_variant_to_experiment():
 
     with pytest.raises(Exception) as e_info:
         ExperimentService.add_variant_to_experiment(
-            uuid.uuid4(), mcu_variant.variant_uuid
+            unused_uuid(), mcu_variant.variant_uuid
         )
 
     assert "Experiment not found" in str(e_info.value)
@@ -129,19 +104,21 @@ def test_add_variant_to_experiment():
     )
 
 
-def test_participant_in_experiment():
+def test_participant_in_experiment(
+    test_experiment, marvel_participants, dc_participants
+):
     assert ExperimentService.participant_in_experiment(
-        test_experiment.experiment_uuid, marvel_participant_uuids[0]
+        test_experiment.experiment_uuid, marvel_participants[0].participant_uuid
     )
     assert ExperimentService.participant_in_experiment(
-        test_experiment.experiment_uuid, dc_participant_uuids[0]
+        test_experiment.experiment_uuid, dc_participants[0].participant_uuid
     )
 
     assert not ExperimentService.participant_in_experiment(
-        test_experiment.experiment_uuid, uuid.uuid4()
+        test_experiment.experiment_uuid, unused_uuid()
     )
     assert not ExperimentService.participant_in_experiment(
-        uuid.uuid4(), marvel_participant_uuids[0]
+        unused_uuid(), marvel_participants[0].participant_uuid
     )
 
 
@@ -179,30 +156,39 @@ def test_add_participant_to_experiment():
     assert "Participant already in experiment" in str(e_info.value)
 
     with pytest.raises(Exception) as e_info:
-        ExperimentService.add_participant_to_experiment(uuid.uuid4(), uuid.uuid4())
+        ExperimentService.add_participant_to_experiment(unused_uuid(), unused_uuid())
     assert "Experiment not found" in str(e_info.value)
 
-    ExperimentRepository.update(
-        misc_experiment.experiment_uuid,
-        experiment_status=ExperimentStatus.COMPLETED,
-    )
-
-    with pytest.raises(Exception) as e_info:
-        ExperimentService.add_participant_to_experiment(
-            misc_experiment.experiment_uuid, misc_participant.participant_uuid
+    # Experiments that have ended or are paused take no new participants
+    for closed_status in (ExperimentStatus.COMPLETED, ExperimentStatus.PAUSED):
+        ExperimentRepository.update(
+            misc_experiment.experiment_uuid, experiment_status=closed_status
+        )
+        assert (
+            ExperimentService.add_participant_to_experiment(
+                misc_experiment.experiment_uuid, uuid.uuid4()
+            )
+            is None
+        )
+        assert (
+            ExperimentService.add_participants_to_experiment(
+                misc_experiment.experiment_uuid, [uuid.uuid4()]
+            )
+            == {}
         )
-    assert "Experiment has ended" in str(e_info.value)
 
 
-def test_get_experiment():
+def test_get_experiment(test_experiment):
     assert (
         ExperimentService.get_experiment(test_experiment.experiment_uuid)
         == test_experiment
     )
-    assert ExperimentService.get_experiment(uuid.uuid4()) is None
+    assert ExperimentService.get_experiment(unused_uuid()) is None
 
 
-def test_get_variant_for_participant():
+def test_get_variant_for_participant(
+    test_experiment, mcu_variant, dceu_variant, marvel_participants, dc_participants
+):
     marvel_fan = marvel_participants[-1]
     dc_fan = dc_participants[-1]
 
@@ -220,145 +206,392 @@ def test_get_variant_for_participant():
     )
     assert (
         ExperimentService.get_variant_uuid_for_participant(
-            uuid.uuid4(), marvel_fan.participant_uuid
+            unused_uuid(), marvel_fan.participant_uuid
         )
         is None
     )
     assert (
         ExperimentService.get_variant_uuid_for_participant(
-            test_experiment.experiment_uuid, uuid.uuid4()
+            test_experiment.experiment_uuid, unused_uuid()
         )
         is None
     )
 
 
-def test_start_experiment():
+@pytest.mark.parametrize(
+    "action",
+    [
+        ExperimentService.start_experiment,
+        ExperimentService.pause_experiment,
+        ExperimentService.complete_experiment,
+        ExperimentService.stop_experiment,
+    ],
+)
+def test_status_change_not_found(action):
     with pytest.raises(Exception) as e_info:
-        ExperimentService.start_experiment(uuid.uuid4())
+        action(unused_uuid())
     assert "Experiment not found" in str(e_info.value)
 
+
+@pytest.mark.parametrize(
+    "action, start_status, expected",
+    [
+        (
+            ExperimentService.start_experiment,
+            ExperimentStatus.CREATED,
+            ExperimentStatus.RUNNING,
+        ),
+        (
+            ExperimentService.start_experiment,
+            ExperimentStatus.RUNNING,
+            ExperimentStatus.RUNNING,
+        ),
+        (
+            ExperimentService.start_experiment,
+            ExperimentStatus.PAUSED,
+            ExperimentStatus.RUNNING,
+        ),
+        (
+            ExperimentService.start_experiment,
+            ExperimentStatus.COMPLETED,
+            ExperimentStatus.COMPLETED,
+        ),
+        (
+            ExperimentService.pause_experiment,
+            ExperimentStatus.CREATED,
+            ExperimentStatus.CREATED,
+        ),
+        (
+            ExperimentService.pause_experiment,
+            ExperimentStatus.RUNNING,
+            ExperimentStatus.PAUSED,
+        ),
+        (
+            ExperimentService.pause_experiment,
+            ExperimentStatus.PAUSED,
+            ExperimentStatus.PAUSED,
+        ),
+        (
+            ExperimentService.pause_experiment,
+            ExperimentStatus.STOPPED,
+            ExperimentStatus.STOPPED,
+        ),
+        (
+            ExperimentService.complete_experiment,
+            ExperimentStatus.CREATED,
+            ExperimentStatus.COMPLETED,
+        ),
+        (
+            ExperimentService.stop_experiment,
+            ExperimentStatus.CREATED,
+            ExperimentStatus.STOPPED,
+        ),
+        (
+            ExperimentService.stop_experiment,
+            ExperimentStatus.COMPLETED,
+            ExperimentStatus.COMPLETED,
+        ),
+    ],
+)
+def test_status_change(action, start_status, expected):
+    misc_experiment: Experiment = ExperimentRepository.create(
+        name="Random", experiment_status=start_status
+    )
+
+    assert action(misc_experiment.experiment_uuid) == expected
+    assert ExperimentService.get_status(misc_experiment.experiment_uuid) == expected
+
+
+def test_start_experiment_start_date():
     misc_experiment: Experiment = ExperimentRepository.create(
         name="Random",
         description="Testing starting an experiment",
         experiment_variants=[],
     )
-
     assert misc_experiment.start_date is None
 
-    assert (
-        ExperimentService.start_experiment(misc_experiment.experiment_uuid)
-        == ExperimentStatus.RUNNING
+    ExperimentService.start_experiment(misc_experiment.experiment_uuid)
+    current_start_date = ExperimentRepository.read_field(
+        misc_experiment.experiment_uuid, "start_date"
     )
-    misc_experiment = ExperimentRepository.read(misc_experiment.experiment_uuid)
-    current_start_date = misc_experiment.start_date
     assert current_start_date is not None
-    assert misc_experiment.experiment_status == ExperimentStatus.RUNNING
 
+    ExperimentService.pause_experiment(misc_experiment.experiment_uuid)
     ExperimentService.start_experiment(misc_experiment.experiment_uuid)
-    assert misc_experiment.start_date == current_start_date
-    assert misc_experiment.experiment_status == ExperimentStatus.RUNNING
+    assert (
+        ExperimentRepository.read_field(misc_experiment.experiment_uuid, "start_date")
+        == current_start_date
+    )
 
-    ExperimentRepository.update(
-        misc_experiment.experiment_uuid,
-        experiment_status=ExperimentStatus.COMPLETED,
+
+def test_end_experiment_end_date():
+    misc_experiment: Experiment = ExperimentRepository.create(name="Random")
+
+    ExperimentService.complete_experiment(misc_experiment.experiment_uuid)
+    current_end_date = ExperimentRepository.read_field(
+        misc_experiment.experiment_uuid, "end_date"
     )
+    assert current_end_date is not None
 
+    ExperimentService.stop_experiment(misc_experiment.experiment_uuid)
     assert (
-        ExperimentService.start_experiment(misc_experiment.experiment_uuid)
-        == ExperimentStatus.COMPLETED
+        ExperimentRepository.read_field(misc_experiment.experiment_uuid, "end_date")
+        == current_end_date
     )
-    assert misc_experiment.start_date == current_start_date
 
 
-def test_pause_experiment():
+def test_add_participant_respects_allocation():
+    empty_variant: ExperimentVariant = ExperimentVariantRepository.create(
+        name="Empty", allocation=0
+    )
+    full_variant: ExperimentVariant = ExperimentVariantRepository.create(
+        name="Full", allocation=1
+    )
     misc_experiment: Experiment = ExperimentRepository.create(
-        name="Random",
-        description="Testing pausing an experiment",
-        experiment_variants=[],
+        name="Allocation",
+        experiment_variants=[empty_variant.variant_uuid, full_variant.variant_uuid],
     )
 
+    for _i in range(5):
+        assert (
+            ExperimentService.add_participant_to_experiment(
+                misc_experiment.experiment_uuid, uuid.uuid4()
+            )
+            == full_variant.variant_uuid
+        )
+
+    ExperimentVariantService.update_allocation(full_variant.variant_uuid, 0)
     with pytest.raises(Exception) as e_info:
-        ExperimentService.pause_experiment(uuid.uuid4())
-    assert "Experiment not found" in str(e_info.value)
+        ExperimentService.add_participant_to_experiment(
+            misc_experiment.experiment_uuid, uuid.uuid4()
+        )
+    assert "No allocation for any variant" in str(e_info.value)
 
-    assert (
-        ExperimentService.pause_experiment(misc_experiment.experiment_uuid)
-        == ExperimentStatus.CREATED
+
+def test_add_participants_to_experiment():
+    first_variant: ExperimentVariant = ExperimentVariantRepository.create(
+        name="First", allocation=1
     )
-    ExperimentRepository.update(
-        misc_experiment.experiment_uuid,
-        experiment_status=ExperimentStatus.PAUSED,
+    second_variant: ExperimentVariant = ExperimentVariantRepository.create(
+        name="Second", allocation=1
     )
-
-    assert (
-        ExperimentService.pause_experiment(misc_experiment.experiment_uuid)
-        == ExperimentStatus.PAUSED
+    misc_experiment: Experiment = ExperimentRepository.create(
+        name="Batch",
+        experiment_variants=[first_variant.variant_uuid, second_variant.variant_uuid],
+    )
+    existing_uuid = uuid.uuid4()
+    existing_variant_uuid = ExperimentService.add_participant_to_experiment(
+        misc_experiment.experiment_uuid, existing_uuid
     )
 
-    ExperimentRepository.update(
-        misc_experiment.experiment_uuid,
-        experiment_status=ExperimentStatus.STOPPED,
+    new_uuids = [uuid.uuid4() for _i in range(6)]
+    assignments = ExperimentService.add_participants_to_experiment(
+        misc_experiment.experiment_uuid, new_uuids + [existing_uuid]
     )
+
+    assert set(assignments) == set(new_uuids)
+    for participant_uuid, variant_uuid in assignments.items():
+        assert (
+            ExperimentService.get_variant_uuid_for_participant(
+                misc_experiment.experiment_uuid, participant_uuid
+            )
+            == variant_uuid
+        )
     assert (
-        ExperimentService.pause_experiment(misc_experiment.experiment_uuid)
-        == ExperimentStatus.STOPPED
+        ExperimentService.get_variant_uuid_for_participant(
+            misc_experiment.experiment_uuid, existing_uuid
+        )
+        == existing_variant_uuid
     )
 
 
-def test_end_experiment():
+def test_add_participants_to_experiment_already_assigned():
+    variant: ExperimentVariant = ExperimentVariantRepository.create(
+        name="Only", allocation=1
+    )
     misc_experiment: Experiment = ExperimentRepository.create(
-        name="Random",
-        description="Testing ending an experiment",
-        experiment_variants=[],
+        name="Already assigned", experiment_variants=[variant.variant_uuid]
     )
+    recorded_uuid = uuid.uuid4()
+    ParticipantAssignmentRepository.assign(
+        misc_experiment.experiment_uuid, recorded_uuid, variant.variant_uuid
+    )
+    deferred_uuid = uuid.uuid4()
+    new_uuid = uuid.uuid4()
 
-    with pytest.raises(Exception) as e_info:
-        ExperimentService.end_experiment(uuid.uuid4(), ExperimentStatus.COMPLETED)
-    assert "Experiment not found" in str(e_info.value)
+    ExperimentVariantRepository.defer_participant_pushes()
+    try:
+        ExperimentVariantRepository.push_participant(
+            variant.variant_uuid, deferred_uuid
+        )
+        assignments = ExperimentService.add_participants_to_experiment(
+            misc_experiment.experiment_uuid, [recorded_uuid, deferred_uuid, new_uuid]
+        )
+    finally:
+        ExperimentVariantRepository.flush_participant_pushes()
+
+    assert assignments == {new_uuid: variant.variant_uuid}
 
+
+def test_participant_assignments(test_experiment, mcu_variant, marvel_participants):
+    misc_variant: ExperimentVariant = ExperimentVariantRepository.create(name="Misc")
+    misc_experiment: Experiment = ExperimentRepository.create(
+        name="Assignments", experiment_variants=[misc_variant.variant_uuid]
+    )
+    participant_uuid = uuid.uuid4()
+
+    ExperimentService.add_participant_to_experiment(
+        misc_experiment.experiment_uuid, participant_uuid
+    )
+    assert (
+        ParticipantAssignmentRepository.get_variant_uuid(
+            misc_experiment.experiment_uuid, participant_uuid
+        )
+        == misc_variant.variant_uuid
+    )
+    assert ParticipantAssignmentRepository.has_assignment(
+        misc_experiment.experiment_uuid, participant_uuid
+    )
+    assert not ParticipantAssignmentRepository.has_assignment(
+        misc_experiment.experiment_uuid, unused_uuid()
+    )
+    assert (
+        ParticipantAssignmentRepository.get_variant_name(
+            misc_experiment.experiment_uuid, participant_uuid
+        )
+        == "Misc"
+    )
     assert (
-        ExperimentService.end_experiment(
-            misc_experiment.experiment_uuid, ExperimentStatus.COMPLETED
+        ParticipantAssignmentRepository.get_variant_name(
+            misc_experiment.experiment_uuid, unused_uuid()
         )
-        == ExperimentStatus.COMPLETED
+        is None
     )
     assert (
-        ExperimentService.end_experiment(
-            misc_experiment.experiment_uuid, ExperimentStatus.STOPPED
+        ParticipantAssignmentRepository.assign(
+            misc_experiment.experiment_uuid, participant_uuid, uuid.uuid4()
         )
-        == ExperimentStatus.COMPLETED
+        is None
     )
 
-    misc_experiment = ExperimentRepository.create()
+    # Participants placed directly in a variant are found without an assignment
+    marvel_fan = marvel_participants[0].participant_uuid
     assert (
-        ExperimentService.end_experiment(
-            misc_experiment.experiment_uuid, ExperimentStatus.STOPPED
+        ExperimentService.get_variant_uuid_for_participant(
+            test_experiment.experiment_uuid, marvel_fan
         )
-        == ExperimentStatus.STOPPED
+        == mcu_variant.variant_uuid
+    )
+    assert not ParticipantAssignmentRepository.has_assignment(
+        test_experiment.experiment_uuid, marvel_fan
     )
 
 
-def test_complete_experiment():
-    misc_experiment: Experiment = ExperimentRepository.create(
-        name="Random",
-        description="Testing completing an experiment",
-        experiment_variants=[],
+def test_backfill_assignments():
+    participant_uuids = [uuid.uuid4() for _i in range(3)]
+    listed_variant: ExperimentVariant = ExperimentVariantRepository.create(
+        name="Listed", participants=participant_uuids
+    )
+    listed_experiment: Experiment = ExperimentRepository.create(
+        name="Backfill", experiment_variants=[listed_variant.variant_uuid]
+    )
+    ParticipantAssignmentRepository.assign(
+        listed_experiment.experiment_uuid,
+        participant_uuids[0],
+        listed_variant.variant_uuid,
     )
 
     assert (
-        ExperimentService.complete_experiment(misc_experiment.experiment_uuid)
-        == ExperimentStatus.COMPLETED
+        ExperimentService.backfill_assignments(listed_experiment.experiment_uuid) == 2
+    )
+    assert ParticipantAssignmentRepository.get_variant_uuids(
+        listed_experiment.experiment_uuid, participant_uuids
+    ) == dict.fromkeys(participant_uuids, listed_variant.variant_uuid)
+    assert (
+        ExperimentService.backfill_assignments(listed_experiment.experiment_uuid) == 0
     )
 
+    with pytest.raises(Exception, match="Experiment not found"):
+        ExperimentService.backfill_assignments(unused_uuid())
 
-def test_stop_experiment():
-    misc_experiment: Experiment = ExperimentRepository.create(
-        name="Random",
-        description="Testing stopping an experiment",
-        experiment_variants=[],
+
+def test_assignment_point():
+    experiment_uuid = uuid.uuid4()
+    participant_uuid = uuid.uuid4()
+    point = ExperimentService.assignment_point(experiment_uuid, participant_uuid)
+
+    assert 0 <= point < 1
+    assert point == ExperimentService.assignment_point(
+        experiment_uuid, participant_uuid
     )
+    assert point != ExperimentService.assignment_point(unused_uuid(), participant_uuid)
+
+    variants = [
+        ExperimentVariant(name="low", allocation=1),
+        ExperimentVariant(name="none", allocation=0),
+        ExperimentVariant(name="high", allocation=1),
+    ]
+    assert ExperimentService.choose_variant(variants, 0.25).name == "low"
+    assert ExperimentService.choose_variant(variants, 0.75).name == "high"
+
 
+def test_build_button_experiment():
+    button_experiment = Helpful.build_button_experiment(12)
+    participant_uuids = button_experiment["participant_uuids"]
+    variants = button_experiment["variants"]
+
+    assert len(variants) == 5
+    assert variants[0].participants == participant_uuids[0::5]
+    assert variants[4].participants == participant_uuids[4::5]
+    assert sum(len(variant.participants) for variant in variants) == 12
+    assert ParticipantService.get_participant(participant_uuids[-1]) is not None
     assert (
-        ExperimentService.stop_experiment(misc_experiment.experiment_uuid)
-        == ExperimentStatus.STOPPED
+        ParticipantAssignmentRepository.get_variant_uuid(
+            button_experiment["experiment"].experiment_uuid, participant_uuids[1]
+        )
+        == variants[1].variant_uuid
+    )
+
+
+def test_alias_table():
+    assert alias_table(()) is None
+    assert alias_table((0, 0)) is None
+    assert alias_table((1,)) == ((1.0,), (0,))
+
+    probabilities, aliases = alias_table((1, 0, 1))
+    assert probabilities[1] == 0
+    assert aliases[1] != 1
+
+
+def test_random_string():
+    generated = Helpful.random_string(20)
+
+    assert len(generated) == 20
+    assert generated.isalpha() and generated.islower()
+    assert Helpful.random_string(0) == ""
+
+
+def test_get_variant_name_for_participant():
+    participant_uuid = uuid.uuid4()
+    listed_variant: ExperimentVariant = ExperimentVariantRepository.create(
+        name="Listed", participants=[participant_uuid]
+    )
+    listed_experiment: Experiment = ExperimentRepository.create(
+        name="Unrecorded", experiment_variants=[listed_variant.variant_uuid]
+    )
+
+    assert (
+        ExperimentService.get_variant_name_for_participant(
+            listed_experiment, participant_uuid
+        )
+        == "Listed"
+    )
+    assert not ParticipantAssignmentRepository.has_assignment(
+        listed_experiment.experiment_uuid, participant_uuid
+    )
+    assert (
+        ExperimentService.get_variant_name_for_participant(
+            listed_experiment, unused_uuid()
+        )
+        is None
     )
@@ -3,6 +3,7 @@
 import uuid
 
 import pytest
+from _uuids import unused_uuid
 
 from src.database.models import ExperimentParticipant, ExperimentVariant
 from src.database.repository import (
@@ -11,14 +12,7 @@ from src.database.repository import (
 )
 from src.services import ExperimentVariantService
 
-rando: ExperimentParticipant = ExperimentParticipantRepository.create()
-variant_uuid = uuid.uuid4()
-variant: ExperimentVariant = ExperimentVariantRepository.create(
-    name="Southern Variant",
-    description="The good ole south",
-    variant_uuid=variant_uuid,
-    participants=[rando.participant_uuid],
-)
+pytestmark = pytest.mark.db
 
 
 def test_update_allocation():
@@ -43,25 +37,25 @@ def test_update_allocation():
     assert "Allocation must be a positive number" in str(e_info.value)
 
 
-def test_participant_in_variant():
+def test_participant_in_variant(rando, southern_variant):
     assert ExperimentVariantService.participant_in_variant(
-        variant_uuid, rando.participant_uuid
+        southern_variant.variant_uuid, rando.participant_uuid
     )
     assert not ExperimentVariantService.participant_in_variant(
-        variant.variant_uuid, uuid.uuid4()
+        southern_variant.variant_uuid, unused_uuid()
     )
     assert not ExperimentVariantService.participant_in_variant(
-        uuid.uuid4(), rando.participant_uuid
+        unused_uuid(), rando.participant_uuid
     )
     assert not ExperimentVariantService.participant_in_variant(
-        uuid.uuid4(), uuid.uuid4()
+        unused_uuid(), unused_uuid()
     )
 
 
-def test_add_participant_to_variant():
+def test_add_participant_to_variant(rando):
     with pytest.raises(Exception) as e_info:
         ExperimentVariantService.add_participant_to_variant(
-            uuid.uuid4(), rando.participant_uuid
+            unused_uuid(), rando.participant_uuid
         )
     assert "Variant not found" in str(e_info.value)
 
@@ -79,6 +73,32 @@ def test_add_participant_to_variant():
     )
 
 
-def test_get_variant():
-    assert ExperimentVariantService.get_variant(variant_uuid) == variant
-    assert ExperimentVariantService.get_variant(uuid.uuid4()) is None
+def test_add_participants_to_variant():
+    misc_variant: ExperimentVariant = ExperimentVariantRepository.create(name="Many")
+    participant_uuids = [uuid.uuid4() for _i in range(9)]
+
+    assert ExperimentVariantService.add_participants_to_variant(
+        misc_variant.variant_uuid, participant_uuids
+    )
+    assert not ExperimentVariantService.add_participants_to_variant(
+        misc_variant.variant_uuid, participant_uuids[:3]
+    )
+    assert (
+        ExperimentVariantService.get_variant(
+            misc_variant.variant_uuid
+        ).participant_count
+        == 9
+    )
+    with pytest.raises(Exception) as e_info:
+        ExperimentVariantService.add_participants_to_variant(
+            unused_uuid(), participant_uuids
+        )
+    assert "Variant not found" in str(e_info.value)
+
+
+def test_get_variant(southern_variant):
+    assert (
+        ExperimentVariantService.get_variant(southern_variant.variant_uuid)
+        == southern_variant
+    )
+    assert ExperimentVariantService.get_variant(unused_uuid()) is None
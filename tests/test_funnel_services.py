@@ -1,13 +1,16 @@
 # pylint: disable=missing-docstring
-
-
 import uuid
 from datetime import datetime, timedelta
 
+import pytest
+from _uuids import unused_uuid
+
 from src.database.models import FunnelEvent, FunnelStep
 from src.database.repository import FunnelEventRepository, ParticipantToUserRepository
 from src.services import AuthService, FunnelEventService, Helpful, ParticipantService
 
+pytestmark = pytest.mark.db
+
 
 def test_create_funnel_event():
     session_uuid = uuid.uuid4()
@@ -25,9 +28,9 @@ def test_create_funnel_event():
 
 
 def test_attempt_to_link_participant():
-    assert not FunnelEventService.attempt_to_link_participant(uuid.uuid4(), None)
+    assert not FunnelEventService.attempt_to_link_participant(unused_uuid(), None)
     assert not FunnelEventService.attempt_to_link_participant(
-        uuid.uuid4(), uuid.uuid4()
+        unused_uuid(), unused_uuid()
     )
     username = Helpful.random_string(10)
     user = AuthService.create_user(username, "test_password")
@@ -41,3 +44,20 @@ def test_attempt_to_link_participant():
     linking = ParticipantToUserRepository.read(participant_uuid)
     assert linking is not None
     assert linking.user_uuid == user.user_uuid
+
+
+def test_create_funnel_events():
+    session_uuid = uuid.uuid4()
+    existing_event = FunnelEventService.create_funnel_event(
+        session_uuid, FunnelStep.LANDED, datetime.now()
+    )
+    events = [
+        FunnelEvent(session_uuid=session_uuid, event_step=FunnelStep.SIGNING_UP),
+        FunnelEvent(session_uuid=session_uuid, event_uuid=existing_event.event_uuid),
+    ]
+
+    created_events = FunnelEventService.create_funnel_events(events)
+
+    assert created_events == events[:1]
+    assert FunnelEventRepository.read(events[0].event_uuid) == events[0]
+    assert FunnelEventService.create_funnel_events([]) == []
@@ -3,6 +3,7 @@
 import uuid
 
 import pytest
+from _uuids import unused_uuid
 
 from src.database.models import Experiment, ExperimentStatus
 from src.database.repository import (
@@ -12,12 +13,14 @@ from src.database.repository import (
 )
 from src.interface import ExperimentInterface
 from src.services import ExperimentService, ExperimentVariantService, ParticipantService
+from src.shared import db
+
+pytestmark = pytest.mark.db
 
 
 def build_full_basic_experiment() -> dict:
     participant_uuids = [uuid.uuid4() for _i in range(12)]
-    for p_uuid in participant_uuids:
-        ParticipantService.create_participant(p_uuid)
+    ParticipantService.create_participants(participant_uuids)
 
     variant_names = [
         "red_no_text",
@@ -52,7 +55,7 @@ def build_full_basic_experiment() -> dict:
 
 def test_get_variant_name():
     with pytest.raises(Exception) as e_info:
-        ExperimentInterface.get_variant_name(uuid.uuid4(), uuid.uuid4())
+        ExperimentInterface.get_variant_name(unused_uuid(), unused_uuid())
     assert "Experiment not found" in str(e_info.value)
 
     stopped_experiment_uuid = uuid.uuid4()
@@ -61,7 +64,7 @@ def test_get_variant_name():
         experiment_status=ExperimentStatus.STOPPED,
     )
     assert (
-        ExperimentInterface.get_variant_name(stopped_experiment_uuid, uuid.uuid4())
+        ExperimentInterface.get_variant_name(stopped_experiment_uuid, unused_uuid())
         == "default"
     )
 
@@ -70,16 +73,186 @@ def test_get_variant_name():
     participant_uuids = experiment_vals["participant_uuids"]
     variants = experiment_vals["variants"]
 
-    for p_uuid in participant_uuids:
-        assert (
-            ExperimentInterface.get_variant_name(experiment.experiment_uuid, p_uuid)
-            == "default"
+    assert (
+        ExperimentInterface.get_variant_name(
+            experiment.experiment_uuid, participant_uuids[0]
         )
+        == "default"
+    )
+    assert ExperimentInterface.get_variant_names(
+        experiment.experiment_uuid, participant_uuids
+    ) == dict.fromkeys(participant_uuids, "default")
 
     ExperimentService.start_experiment(experiment.experiment_uuid)
 
+    assert (
+        ExperimentInterface.get_variant_name(
+            experiment.experiment_uuid, participant_uuids[0]
+        )
+        == variants[0].name
+    )
+    names = ExperimentInterface.get_variant_names(
+        experiment.experiment_uuid, participant_uuids
+    )
+    expected_names = tuple(variant.name for variant in variants)
     for i, p_uuid in enumerate(participant_uuids):
+        assert names[p_uuid] == expected_names[i % len(expected_names)]
+
+
+def test_get_variant_names_new_participants():
+    with pytest.raises(Exception) as e_info:
+        ExperimentInterface.get_variant_names(unused_uuid(), [unused_uuid()])
+    assert "Experiment not found" in str(e_info.value)
+
+    experiment = build_full_basic_experiment()["experiment"]
+    new_uuids = [uuid.uuid4() for _i in range(4)]
+    variant_names = {
+        variant.name
+        for variant in ExperimentVariantRepository.read_many(
+            experiment.experiment_variants
+        )
+    }
+
+    ExperimentService.start_experiment(experiment.experiment_uuid)
+    names = ExperimentInterface.get_variant_names(experiment.experiment_uuid, new_uuids)
+    assert set(names) == set(new_uuids)
+    assert set(names.values()) <= variant_names
+    for p_uuid in new_uuids:
         assert (
             ExperimentInterface.get_variant_name(experiment.experiment_uuid, p_uuid)
-            == variants[i % 5].name
+            == names[p_uuid]
         )
+
+    ExperimentService.pause_experiment(experiment.experiment_uuid)
+    paused_uuid = uuid.uuid4()
+    assert ExperimentInterface.get_variant_names(
+        experiment.experiment_uuid, [new_uuids[0], paused_uuid]
+    ) == {new_uuids[0]: names[new_uuids[0]], paused_uuid: "default"}
+
+
+def test_get_variant_name_stale_status():
+    experiment = build_full_basic_experiment()["experiment"]
+    ExperimentService.start_experiment(experiment.experiment_uuid)
+    assert ExperimentRepository.read(experiment.experiment_uuid) is not None
+
+    # Stopped by another process, so the cached read still says running
+    db.get_collection(Experiment).update_one(
+        {"experiment_uuid": experiment.experiment_uuid},
+        {"$set": {"experiment_status": ExperimentStatus.STOPPED.value}},
+    )
+    assert (
+        ExperimentRepository.read(experiment.experiment_uuid).experiment_status
+        == ExperimentStatus.RUNNING
+    )
+
+    participant_uuid = uuid.uuid4()
+    assert (
+        ExperimentInterface.get_variant_name(
+            experiment.experiment_uuid, participant_uuid
+        )
+        == "default"
+    )
+    assert ExperimentInterface.get_variant_names(
+        experiment.experiment_uuid, [participant_uuid]
+    ) == {participant_uuid: "default"}
+
+
+def test_get_experiment_summary():
+    assert ExperimentInterface.get_experiment_summary(unused_uuid()) == {}
+
+    experiment_vals = build_full_basic_experiment()
+    experiment = experiment_vals["experiment"]
+    variants = experiment_vals["variants"]
+
+    summary = ExperimentInterface.get_experiment_summary(experiment.experiment_uuid)
+
+    assert summary["experiment"].experiment_uuid == experiment.experiment_uuid
+    assert [variant.name for variant in summary["variants"]] == [
+        variant.name for variant in variants
+    ]
+    assert summary["variant_to_participants"] == {
+        variant.variant_uuid: len(variant.participants) for variant in variants
+    }
+    assert summary["total_allocation"] == len(variants)
+
+
+def test_get_experiment_summary_cached():
+    experiment = build_full_basic_experiment()["experiment"]
+    summary = ExperimentInterface.get_experiment_summary(experiment.experiment_uuid)
+
+    assert (
+        ExperimentInterface.get_experiment_summary(experiment.experiment_uuid)
+        is summary
+    )
+
+    ExperimentService.start_experiment(experiment.experiment_uuid)
+    started_summary = ExperimentInterface.get_experiment_summary(
+        experiment.experiment_uuid
+    )
+    assert started_summary is not summary
+    assert started_summary["experiment"].experiment_status == ExperimentStatus.RUNNING
+
+
+def test_get_experiment_summary_participants_added():
+    experiment = build_full_basic_experiment()["experiment"]
+    ExperimentService.start_experiment(experiment.experiment_uuid)
+
+    def participant_total() -> int:
+        summary = ExperimentInterface.get_experiment_summary(experiment.experiment_uuid)
+        return sum(summary["variant_to_participants"].values())
+
+    assert participant_total() == 12
+
+    ExperimentService.add_participants_to_experiment(
+        experiment.experiment_uuid, [uuid.uuid4(), uuid.uuid4()]
+    )
+    assert participant_total() == 14
+
+    ExperimentVariantRepository.defer_participant_pushes()
+    try:
+        ExperimentService.add_participant_to_experiment(
+            experiment.experiment_uuid, uuid.uuid4()
+        )
+    finally:
+        ExperimentService.flush_participant_pushes()
+    assert participant_total() == 15
+
+
+def test_update_variant_allocations():
+    experiment_vals = build_full_basic_experiment()
+    experiment = experiment_vals["experiment"]
+    variant_uuids = [variant.variant_uuid for variant in experiment_vals["variants"]]
+    allocations = [0.5, 1, 1.5, 2, 2.5]
+
+    assert not ExperimentInterface.update_variant_allocations(
+        experiment.experiment_uuid, allocations
+    )
+
+    ExperimentService.start_experiment(experiment.experiment_uuid)
+    assert not ExperimentInterface.update_variant_allocations(
+        experiment.experiment_uuid, allocations[:2]
+    )
+    assert ExperimentInterface.update_variant_allocations(
+        experiment.experiment_uuid, allocations
+    )
+    assert [
+        variant.allocation
+        for variant in ExperimentVariantRepository.read_many(variant_uuids)
+    ] == allocations
+
+    with pytest.raises(Exception, match="Allocation must be a positive number"):
+        ExperimentInterface.update_variant_allocations(
+            experiment.experiment_uuid, [1, 1, 1, 1, -1]
+        )
+    assert [
+        variant.allocation
+        for variant in ExperimentVariantRepository.read_many(variant_uuids)
+    ] == allocations
+
+    assert ExperimentInterface.update_variant_descriptions(
+        experiment.experiment_uuid, ["a", "b", "c", "d", "e"]
+    )
+    assert [
+        variant.description
+        for variant in ExperimentVariantRepository.read_many(variant_uuids)
+    ] == ["a", "b", "c", "d", "e"]
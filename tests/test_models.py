@@ -0,0 +1,80 @@
+# pylint: disable=missing-docstring
+
+import dataclasses
+import uuid
+from typing import Optional, Union
+
+from src.database.models import (
+    Experiment,
+    ExperimentParticipant,
+    ExperimentStatus,
+    FunnelEvent,
+    FunnelStep,
+)
+
+
+def test_instance_fields():
+    assert Experiment.instance_fields() == (
+        "name",
+        "description",
+        "experiment_uuid",
+        "start_date",
+        "end_date",
+        "experiment_status",
+        "experiment_variants",
+    )
+    assert ExperimentParticipant.instance_fields() == ("participant_uuid",)
+
+
+def test_field_types():
+    field_types = Experiment.field_types()
+
+    assert field_types["experiment_uuid"] == Optional[uuid.UUID]
+    assert field_types["experiment_status"] == Union[ExperimentStatus, str]
+    assert "return" not in field_types
+
+
+def test_to_dict():
+    event_uuid = uuid.uuid4()
+    event = FunnelEvent(event_step="signed_up", event_uuid=event_uuid)
+
+    assert event.event_step == FunnelStep.SIGNED_UP
+    assert event.to_dict() == {
+        "session_uuid": None,
+        "event_time": None,
+        "event_uuid": event_uuid,
+        "event_step": "signed_up",
+    }
+
+
+def test_slots():
+    experiment = Experiment(name="slotted")
+
+    assert not hasattr(experiment, "__dict__")
+    assert experiment.uuid is None
+    assert FunnelEvent.instance_fields() == FunnelEvent.__slots__
+
+
+def test_dataclass_fields():
+    experiment_uuid = uuid.uuid4()
+
+    assert dataclasses.is_dataclass(Experiment)
+    assert Experiment(experiment_uuid=experiment_uuid) == Experiment(
+        experiment_uuid=experiment_uuid
+    )
+    assert Experiment(name="first") != Experiment(name="second")
+
+
+def test_contains_variant():
+    variant_uuid = uuid.uuid4()
+    experiment = Experiment(experiment_variants=[variant_uuid])
+
+    assert experiment.contains_variant(variant_uuid)
+    assert not experiment.contains_variant(uuid.uuid4())
+
+    added_uuid = uuid.uuid4()
+    experiment.experiment_variants.append(added_uuid)
+    assert experiment.contains_variant(added_uuid)
+
+    experiment.experiment_variants = []
+    assert not experiment.contains_variant(variant_uuid)
@@ -4,6 +4,7 @@ import random
 import uuid
 
 import pytest
+from _uuids import unused_uuid
 
 from src.database.models import ExperimentParticipant
 from src.database.repository import (
@@ -12,6 +13,8 @@ from src.database.repository import (
 )
 from src.services import ParticipantService
 
+pytestmark = pytest.mark.db
+
 
 def test_create_participant():
     new_uuid = uuid.uuid4()
@@ -20,9 +23,21 @@ def test_create_participant():
     assert participant is not None
     assert participant.participant_uuid == new_uuid
 
-    with pytest.raises(Exception) as e_info:
+    with pytest.raises(Exception, match="Participant already exists"):
         ParticipantService.create_participant(new_uuid)
-    assert "Participant already exists" in str(e_info.value)
+
+
+def test_create_participants():
+    existing_uuid = uuid.uuid4()
+    ParticipantService.create_participant(existing_uuid)
+    new_uuids = [uuid.uuid4(), uuid.uuid4()]
+
+    participants = ParticipantService.create_participants(
+        [new_uuids[0], existing_uuid, new_uuids[1]]
+    )
+
+    assert [participant.participant_uuid for participant in participants] == new_uuids
+    assert ParticipantService.get_participant(new_uuids[1]) is not None
 
 
 def test_get_participant():
@@ -30,31 +45,28 @@ def test_get_participant():
     participant: ExperimentParticipant = ParticipantService.create_participant(new_uuid)
 
     assert ParticipantService.get_participant(new_uuid) == participant
-    assert ParticipantService.get_participant(uuid.uuid4()) is None
+    assert ParticipantService.get_participant(unused_uuid()) is None
 
 
-def test_link_participant_to_user():
-    new_uuid = uuid.uuid4()
-    participant: ExperimentParticipant = ParticipantService.create_participant(new_uuid)
-    user_uuid = uuid.uuid4()
+def test_link_participant_to_user(linked_participant):
+    linking = ParticipantToUserRepository.read(linked_participant.participant_uuid)
+    assert linking.participant_uuid == linked_participant.participant_uuid
+    assert linking.user_uuid == linked_participant.user_uuid
 
-    assert ParticipantService.link_participant_to_user(
-        participant.participant_uuid, user_uuid
-    )
-    linking = ParticipantToUserRepository.read(participant.participant_uuid)
-    assert linking.participant_uuid == participant.participant_uuid
-    assert linking.user_uuid == user_uuid
 
-    with pytest.raises(Exception) as e_info:
+@pytest.mark.parametrize(
+    "with_participant, with_user, message",
+    [
+        (True, True, "Participant already linked to a user"),
+        (False, True, "Participant and user UUIDs are required"),
+        (True, False, "Participant and user UUIDs are required"),
+    ],
+)
+def test_link_participant_to_user_errors(
+    linked_participant, with_participant, with_user, message
+):
+    with pytest.raises(Exception, match=message):
         ParticipantService.link_participant_to_user(
-            participant.participant_uuid, user_uuid
+            linked_participant.participant_uuid if with_participant else None,
+            linked_participant.user_uuid if with_user else None,
         )
-    assert "Participant already linked to a user" in str(e_info.value)
-
-    with pytest.raises(Exception) as e_info:
-        ParticipantService.link_participant_to_user(None, user_uuid)
-    assert "Participant and user UUIDs are required" in str(e_info.value)
-
-    with pytest.raises(Exception) as e_info:
-        ParticipantService.link_participant_to_user(participant.participant_uuid, None)
-    assert "Participant and user UUIDs are required" in str(e_info.value)
@@ -3,9 +3,13 @@
 import uuid
 
 import pytest
+from _uuids import unused_uuid
 
-from src.database.models import Experiment, ExperimentStatus
-from src.database.repository import ExperimentRepository
+from src.database.models import Experiment, ExperimentStatus, ExperimentVariant
+from src.database.repository import ExperimentRepository, ExperimentVariantRepository
+from src.shared import db
+
+pytestmark = pytest.mark.db
 
 
 def test_model_class():
@@ -28,11 +32,9 @@ def test_create():
     assert experiment.description == "matrix - red or blue"
     assert experiment.experiment_uuid is not None
 
-    with pytest.raises(Exception) as e_info:
+    with pytest.raises(Exception, match="Invalid field: bad_field"):
         ExperimentRepository.create(bad_field="bad field")
 
-    assert "Invalid field: bad_field" in str(e_info.value)
-
 
 def test_create_with_uuid():
     new_uuid = uuid.uuid4()
@@ -75,6 +77,10 @@ def test_update():
     assert updated_experiment.description == "red"
     assert updated_experiment.experiment_status == ExperimentStatus.RUNNING
     assert len(updated_experiment.experiment_variants) == 2
+    assert ExperimentRepository.read(experiment.experiment_uuid) == updated_experiment
+
+    with pytest.raises(Exception, match="Model does not exist"):
+        ExperimentRepository.update(unused_uuid(), name="missing")
 
 
 def test_update_invalid_field():
@@ -82,10 +88,13 @@ def test_update_invalid_field():
         name="hola world",
         description="matrix - red or blue",
     )
-    with pytest.raises(Exception) as e_info:
+    with pytest.raises(Exception, match="Invalid field: bad_field"):
         ExperimentRepository.update(experiment.experiment_uuid, bad_field="bad field")
 
-    assert "Invalid field: bad_field" in str(e_info.value)
+    with pytest.raises(Exception, match="Invalid field: experiment_uuid"):
+        ExperimentRepository.update(
+            experiment.experiment_uuid, experiment_uuid=uuid.uuid4()
+        )
 
 
 def test_delete():
@@ -98,3 +107,184 @@ def test_delete():
 
     no_experiment = ExperimentRepository.read(experiment.experiment_uuid)
     assert no_experiment is None
+
+
+def test_variant_read_many():
+    first_variant = ExperimentVariantRepository.create(name="first")
+    second_variant = ExperimentVariantRepository.create(name="second")
+
+    variants = ExperimentVariantRepository.read_many(
+        [second_variant.variant_uuid, uuid.uuid4(), first_variant.variant_uuid]
+    )
+
+    assert [variant.name for variant in variants] == ["second", "first"]
+    assert ExperimentVariantRepository.read_many([]) == []
+
+
+def test_get_all(listed_experiments):
+    all_experiments = ExperimentRepository.get_all()
+
+    for experiment in listed_experiments:
+        assert experiment in all_experiments
+
+
+def test_push_participant_many():
+    variant = ExperimentVariantRepository.create(name="many")
+    participant_uuids = [uuid.uuid4(), uuid.uuid4()]
+
+    assert ExperimentVariantRepository.push_participant_many(
+        variant.variant_uuid, participant_uuids
+    )
+    assert not ExperimentVariantRepository.push_participant_many(
+        variant.variant_uuid, participant_uuids
+    )
+    assert (
+        ExperimentVariantRepository.read(variant.variant_uuid).participants
+        == participant_uuids
+    )
+
+
+def test_participant_count():
+    variant = ExperimentVariantRepository.create(
+        name="counted", participants=[uuid.uuid4()]
+    )
+    participant_uuid = uuid.uuid4()
+
+    assert variant.participant_count == 1
+    assert (
+        ExperimentVariantRepository.push_participants(
+            {variant.variant_uuid: [participant_uuid, participant_uuid]}
+        )
+        == 1
+    )
+    assert (
+        ExperimentVariantRepository.push_participants(
+            {variant.variant_uuid: [participant_uuid]}
+        )
+        == 0
+    )
+    assert ExperimentVariantRepository.participant_counts([variant.variant_uuid]) == {
+        variant.variant_uuid: 2
+    }
+
+    updated = ExperimentVariantRepository.update(variant.variant_uuid, participants=[])
+    assert updated.participant_count == 0
+    with pytest.raises(Exception):
+        ExperimentVariantRepository.push_participant_many(unused_uuid(), [uuid.uuid4()])
+
+
+def test_read_many_with_participant_counts():
+    counted = ExperimentVariantRepository.create(
+        name="counted", participants=[uuid.uuid4()]
+    )
+    # A variant written before the participant count was stored
+    uncounted_uuid = uuid.uuid4()
+    db.get_collection(ExperimentVariant).insert_one(
+        {
+            "variant_uuid": uncounted_uuid,
+            "participants": [uuid.uuid4(), uuid.uuid4()],
+        }
+    )
+
+    variants = ExperimentVariantRepository.read_many_with_participant_counts(
+        [uncounted_uuid, uuid.uuid4(), counted.variant_uuid]
+    )
+
+    assert [variant.variant_uuid for variant in variants] == [
+        uncounted_uuid,
+        counted.variant_uuid,
+    ]
+    assert [variant.participant_count for variant in variants] == [2, 1]
+    assert all(variant.participants == [] for variant in variants)
+
+
+def test_push_to_uncounted_variant():
+    # A variant written before the participant count was stored
+    uncounted_uuid = uuid.uuid4()
+    db.get_collection(ExperimentVariant).insert_one(
+        {
+            "variant_uuid": uncounted_uuid,
+            "participants": [uuid.uuid4(), uuid.uuid4()],
+        }
+    )
+
+    assert ExperimentVariantRepository.push_participant_many(
+        uncounted_uuid, [uuid.uuid4()]
+    )
+    assert ExperimentVariantRepository.participant_counts([uncounted_uuid]) == {
+        uncounted_uuid: 3
+    }
+    assert len(ExperimentVariantRepository.read(uncounted_uuid).participants) == 3
+
+
+def test_deferred_participant_pushes():
+    variant = ExperimentVariantRepository.create(name="deferred")
+    participant_uuid = uuid.uuid4()
+
+    ExperimentVariantRepository.defer_participant_pushes()
+    try:
+        assert (
+            ExperimentVariantRepository.push_participant(
+                variant.variant_uuid, participant_uuid
+            )
+            is None
+        )
+        assert not ExperimentVariantRepository.has_participant(
+            variant.variant_uuid, participant_uuid
+        )
+    finally:
+        pushed_count = ExperimentVariantRepository.flush_participant_pushes()
+
+    assert pushed_count == 1
+    assert ExperimentVariantRepository.has_participant(
+        variant.variant_uuid, participant_uuid
+    )
+    assert ExperimentVariantRepository.flush_participant_pushes() == 0
+
+
+def test_request_reads():
+    experiment = ExperimentRepository.create(name="request scoped")
+
+    ExperimentRepository.scope_reads_to_request()
+    try:
+        first_read = ExperimentRepository.read(experiment.experiment_uuid)
+        assert ExperimentRepository.read(experiment.experiment_uuid) is first_read
+
+        ExperimentRepository.update(experiment.experiment_uuid, name="updated")
+        assert ExperimentRepository.read(experiment.experiment_uuid).name == "updated"
+    finally:
+        ExperimentRepository.end_request_reads()
+
+    assert ExperimentRepository.read(experiment.experiment_uuid) is not first_read
+
+
+def test_get_status():
+    experiment = ExperimentRepository.create(experiment_status=ExperimentStatus.PAUSED)
+
+    assert ExperimentRepository.get_status(experiment.experiment_uuid) == (
+        ExperimentStatus.PAUSED
+    )
+    ExperimentRepository.read(experiment.experiment_uuid)
+    assert ExperimentRepository.get_status(experiment.experiment_uuid) == (
+        ExperimentStatus.PAUSED
+    )
+    assert ExperimentRepository.get_status(unused_uuid()) is None
+
+
+def test_read_with_variants():
+    first_variant = ExperimentVariantRepository.create(
+        name="first", participants=[uuid.uuid4()]
+    )
+    second_variant = ExperimentVariantRepository.create(name="second")
+    experiment = ExperimentRepository.create(
+        experiment_variants=[second_variant.variant_uuid, first_variant.variant_uuid]
+    )
+
+    read_experiment, variants = ExperimentRepository.read_with_variants(
+        experiment.experiment_uuid, excluded_variant_fields=("participants",)
+    )
+
+    assert read_experiment == experiment
+    assert [variant.name for variant in variants] == ["second", "first"]
+    assert variants[1].participants == []
+    assert ExperimentRepository.read_with_variants(unused_uuid()) is None